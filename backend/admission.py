@@ -0,0 +1,214 @@
+"""
+Admission control for chat streams.
+
+AdmissionController caps how many runs are active at once. Requests over
+the cap wait in a bounded FIFO queue (reporting their position over SSE)
+and are rejected immediately once the queue is full. RateLimiter is a
+per-client token bucket. Both reject with a Retry-After estimate, so a
+burst is turned away quickly instead of slowing every stream down. A
+queue timeout is only known once the SSE response has begun, so it is
+reported as an error event carrying retry_after instead of a 429.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Dict, Optional
+
+CHAT_MAX_ACTIVE = int(os.getenv("CHAT_MAX_ACTIVE", "32"))  # 0 disables the limit
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "30"))
+# Interval between queue-position events while waiting
+CHAT_QUEUE_STATUS_INTERVAL = float(os.getenv("CHAT_QUEUE_STATUS_INTERVAL", "1"))
+
+# Off by default: behind a proxy (Vercel, nginx) every user has the proxy's address, so the
+# limit only works once a client key is configured (RATE_LIMIT_TRUST_PROXY or RATE_LIMIT_KEY_HEADER)
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "0"))  # 0 disables rate limiting
+CHAT_RATE_BURST = int(os.getenv("CHAT_RATE_BURST", "10"))
+# Use the first X-Forwarded-For address as the client (only behind a trusted proxy)
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+# Header set by your proxy that identifies the client (e.g. x-real-ip, x-vercel-forwarded-for)
+RATE_LIMIT_KEY_HEADER = os.getenv("RATE_LIMIT_KEY_HEADER", "").strip().lower()
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class Ticket:
+    """A request's claim on a run slot; `admitted` once it holds one"""
+    __slots__ = ("admitted", "released", "future", "enqueued_at", "admitted_at")
+
+    def __init__(self, admitted: bool):
+        self.admitted = admitted
+        self.released = False
+        self.future: Optional[asyncio.Future] = None
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = self.enqueued_at if admitted else None
+
+
+class AdmissionController:
+    def __init__(self, max_active: int = CHAT_MAX_ACTIVE, max_queue: int = CHAT_MAX_QUEUE,
+                 queue_timeout: float = CHAT_QUEUE_TIMEOUT):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._queue: deque = deque()  # waiting Tickets, FIFO
+        self._avg_run_seconds = 10.0  # EWMA, feeds Retry-After estimates
+        self.admitted_total = 0
+        self.queued_total = 0
+        self.rejected_total = 0
+        self.timed_out_total = 0
+
+    def enter(self) -> Ticket:
+        """Take a slot, or a place in the queue. Raises AdmissionRejected when the queue is full."""
+        if self.max_active <= 0 or (self.active < self.max_active and not self._queue):
+            self.active += 1
+            self.admitted_total += 1
+            return Ticket(admitted=True)
+        if len(self._queue) >= self.max_queue:
+            self.rejected_total += 1
+            raise AdmissionRejected("queue_full", self.estimated_wait(len(self._queue) + 1))
+        ticket = Ticket(admitted=False)
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queue.append(ticket)
+        self.queued_total += 1
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based queue position (0 once admitted)"""
+        if ticket.admitted:
+            return 0
+        try:
+            return self._queue.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def estimated_wait(self, position: int) -> float:
+        slots = max(self.max_active, 1)
+        return self._avg_run_seconds * math.ceil(position / slots)
+
+    async def wait(self, ticket: Ticket, status_interval: float = CHAT_QUEUE_STATUS_INTERVAL) -> AsyncIterator[int]:
+        """
+        Wait for a queued ticket to be admitted, yielding its queue position
+        whenever it changes (and at least every status_interval seconds).
+        Raises AdmissionRejected on queue timeout.
+        """
+        deadline = ticket.enqueued_at + self.queue_timeout
+        last_position = None
+        while not ticket.admitted:
+            position = self.position(ticket)
+            if position != last_position:
+                last_position = position
+                yield position
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._leave_queue(ticket)
+                self.timed_out_total += 1
+                raise AdmissionRejected("queue_timeout", self.estimated_wait(position))
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), timeout=min(status_interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    def _leave_queue(self, ticket: Ticket) -> None:
+        try:
+            self._queue.remove(ticket)
+        except ValueError:
+            pass
+        ticket.released = True
+
+    def release(self, ticket: Ticket) -> None:
+        """Give the slot back (or leave the queue); safe to call more than once"""
+        if ticket.released:
+            return
+        if not ticket.admitted:
+            self._leave_queue(ticket)
+            return
+        ticket.released = True
+        self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * (time.monotonic() - ticket.admitted_at)
+        # Hand the slot straight to the next waiter so newcomers cannot jump the queue
+        while self._queue:
+            waiter = self._queue.popleft()
+            if waiter.future.done():
+                continue
+            waiter.admitted = True
+            waiter.admitted_at = time.monotonic()
+            waiter.future.set_result(None)
+            self.admitted_total += 1
+            return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": len(self._queue),
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted_total,
+            "queued_total": self.queued_total,
+            "rejected": self.rejected_total,
+            "timed_out": self.timed_out_total,
+            "avg_run_seconds": round(self._avg_run_seconds, 2),
+        }
+
+
+class RateLimiter:
+    """Token bucket per client key; the least recently seen keys are dropped beyond max_clients"""
+
+    def __init__(self, rate_per_minute: float = CHAT_RATE_PER_MINUTE, burst: int = CHAT_RATE_BURST,
+                 max_clients: int = 10000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, key: str) -> None:
+        """Take one token for `key`. Raises AdmissionRejected with the time until the next token."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None) or [float(self.burst), now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return
+            self.limited += 1
+            raise AdmissionRejected("rate_limited", (1 - bucket[0]) / self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"clients": len(self._buckets), "limited": self.limited}
+
+
+def client_key(request) -> str:
+    """Rate limit key: RATE_LIMIT_KEY_HEADER, else the client address (first X-Forwarded-For hop behind a trusted proxy)"""
+    if RATE_LIMIT_KEY_HEADER:
+        value = request.headers.get(RATE_LIMIT_KEY_HEADER)
+        if value:
+            return value.split(",")[0].strip()
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+CHAT_ADMISSION = AdmissionController()
+CHAT_RATE_LIMITER = RateLimiter()
+if CHAT_RATE_PER_MINUTE > 0 and not (RATE_LIMIT_TRUST_PROXY or RATE_LIMIT_KEY_HEADER):
+    print("⚠️ Chat rate limit keys on the socket address; behind a proxy all users share one bucket "
+          "(set RATE_LIMIT_TRUST_PROXY or RATE_LIMIT_KEY_HEADER)")
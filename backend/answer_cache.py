@@ -0,0 +1,186 @@
+"""
+Semantic cache of complete assistant answers.
+
+First-turn questions without attachments are matched against earlier
+questions with a local TF-IDF vectorizer (no network, no model), and a
+close enough match replays the stored answer instead of starting an
+Assistants run. Entries are namespaced by prompt version, expire after a
+TTL and are evicted least-recently-used beyond max_entries.
+
+Numbers are treated as identifiers: "Article 50" never matches "Article 52",
+however similar the rest of the question is.
+"""
+
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from cache import normalize_query
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.85"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+# Answers longer than this are not cached
+ANSWER_CACHE_MAX_CHARS = int(os.getenv("ANSWER_CACHE_MAX_CHARS", "20000"))
+
+_TOKEN = re.compile(r"[a-z]+|\d+[a-z]?")
+_STOPWORDS = frozenset("""
+a an and are as at be by can could do does for from how i in is it me my of on or our
+please should so that the their them there these this to under us we what when which
+who why will with would you your
+""".split())
+
+
+def _stem(word: str) -> str:
+    # Plural folding is enough for short questions ("chatbots" / "chatbot")
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def analyze(question: str) -> Tuple[Counter, FrozenSet[str]]:
+    """Term counts (stemmed unigrams + bigrams) and the set of numbers in a question"""
+    tokens = [_stem(t) for t in _TOKEN.findall(normalize_query(question)) if t not in _STOPWORDS]
+    terms = Counter(tokens)
+    terms.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    numbers = frozenset(t for t in tokens if t[0].isdigit())
+    return terms, numbers
+
+
+class TfidfIndex:
+    """TF-IDF vectors over the cached questions; IDF follows the current contents"""
+
+    def __init__(self):
+        self._df: Counter = Counter()
+        self.size = 0
+
+    def add(self, terms: Counter) -> None:
+        self._df.update(terms.keys())
+        self.size += 1
+
+    def remove(self, terms: Counter) -> None:
+        self._df.subtract(terms.keys())
+        self.size -= 1
+
+    def weights(self, terms: Counter) -> Dict[str, float]:
+        n = self.size + 1
+        weights = {t: (1 + math.log(c)) * (math.log((1 + n) / (1 + self._df[t])) + 1) for t, c in terms.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {t: w / norm for t, w in weights.items()}
+
+    def similarity(self, query_weights: Dict[str, float], terms: Counter) -> float:
+        """Cosine similarity between precomputed query weights and a cached question"""
+        other = self.weights(terms)
+        return sum(w * other.get(t, 0.0) for t, w in query_weights.items())
+
+
+class AnswerCache:
+    """Thread-safe answer cache with similarity lookup, TTL expiry and LRU eviction"""
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, ttl_seconds: float = ANSWER_CACHE_TTL,
+                 max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()  # (namespace, normalized) -> entry
+        self._index: Dict[str, TfidfIndex] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        self._index[key[0]].remove(entry["terms"])
+
+    def lookup(self, question: str, namespace: str) -> Optional[Tuple[dict, float]]:
+        """(entry, similarity) of the closest cached question above the threshold, or None"""
+        terms, numbers = analyze(question)
+        if not terms:
+            return None
+        now = time.time()
+        with self._lock:
+            best_key, best_score = None, 0.0
+            exact = self._entries.get((namespace, normalize_query(question)))
+            if exact is not None and exact["expires_at"] > now:
+                best_key, best_score = (namespace, exact["normalized"]), 1.0
+            else:
+                index = self._index.get(namespace)
+                query_weights = index.weights(terms) if index is not None else {}
+                for key, entry in list(self._entries.items()):
+                    if entry["expires_at"] <= now:
+                        self._drop(key)
+                        self.expirations += 1
+                        continue
+                    if key[0] != namespace or entry["numbers"] != numbers:
+                        continue
+                    score = index.similarity(query_weights, entry["terms"])
+                    if score > best_score:
+                        best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            entry["hits"] += 1
+            self.hits += 1
+            return entry, best_score
+
+    def store(self, question: str, answer: str, namespace: str) -> None:
+        if not answer or len(answer) > ANSWER_CACHE_MAX_CHARS:
+            return
+        terms, numbers = analyze(question)
+        if not terms:
+            return
+        normalized = normalize_query(question)
+        key = (namespace, normalized)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "question": question,
+                "normalized": normalized,
+                "answer": answer,
+                "terms": terms,
+                "numbers": numbers,
+                "created_at": time.time(),
+                "expires_at": time.time() + self.ttl_seconds,
+                "hits": 0,
+            }
+            self._index.setdefault(namespace, TfidfIndex()).add(terms)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+ANSWER_CACHE = AnswerCache()
@@ -0,0 +1,258 @@
+"""
+Bulk risk classification for AI-system inventories.
+
+Reads JSONL or CSV records (id, system_description, features), classifies
+them in chunks on a process pool with the rule-based classifier (no LLM)
+and emits one NDJSON result per record, in input order. At most
+`max_pending` chunks are in flight, so memory stays bounded regardless
+of input size.
+
+CLI usage (from backend/):
+    python batch.py systems.csv -o results.ndjson
+    cat systems.jsonl | python batch.py - --format jsonl
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+from risk_rules import classify_system
+
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+BATCH_MAX_PENDING = int(os.getenv("BATCH_MAX_PENDING", "4"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+# Longest CSV field; also bounds how much an unterminated quoted field can swallow
+BATCH_MAX_FIELD_CHARS = int(os.getenv("BATCH_MAX_FIELD_CHARS", str(64 * 1024)))
+
+_DESCRIPTION_KEYS = ("system_description", "description")
+_ID_KEYS = ("id", "system_id", "name")
+_FEATURE_SEPARATORS = (";", "|")
+
+_executor: Optional[Executor] = None
+
+
+def get_executor() -> Executor:
+    """Shared process pool; falls back to one thread where processes are unavailable (e.g. serverless)"""
+    global _executor
+    if _executor is None:
+        try:
+            _executor = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+        except (OSError, NotImplementedError) as e:
+            print(f"⚠️ Process pool unavailable ({e}), classifying batches in a thread")
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch")
+    return _executor
+
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """'csv' or 'jsonl' from a file extension or content type (defaults to jsonl)"""
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    if content_type and "csv" in content_type.lower():
+        return "csv"
+    return "jsonl"
+
+
+def _parse_features(value) -> List[str]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    if not isinstance(value, str):
+        raise ValueError("features must be a list or a string")
+    text = value
+    for sep in _FEATURE_SEPARATORS:
+        if sep in text:
+            return [part.strip() for part in text.split(sep) if part.strip()]
+    return [text.strip()]
+
+
+def _error(line: int, message: str, record_id=None) -> dict:
+    """An error result; `line` locates it, `id` is only set when the input gave one"""
+    error = {"line": line, "error": message}
+    if record_id is not None:
+        error = {"id": record_id, **error}
+    return error
+
+
+def _to_record(row: dict, line: int) -> dict:
+    description = next((row[k] for k in _DESCRIPTION_KEYS if row.get(k)), None)
+    record_id = next((row[k] for k in _ID_KEYS if row.get(k) not in (None, "")), None)
+    if description is not None and not isinstance(description, str):
+        return _error(line, "system_description must be a string", record_id)
+    try:
+        features = _parse_features(row.get("features"))
+    except ValueError as e:
+        return _error(line, str(e), record_id)
+    return {
+        "id": line if record_id is None else record_id,
+        "line": line,
+        "system_description": description,
+        "features": features,
+    }
+
+
+def _csv_rows(lines: Iterable[str]) -> Iterator[Tuple[int, Optional[List[str]], Optional[str]]]:
+    """
+    (first line, row, error) for each CSV row. The reader joins quoted
+    fields that span lines itself; a row it cannot parse becomes an error
+    and reading carries on with the next line.
+    """
+    csv.field_size_limit(BATCH_MAX_FIELD_CHARS)
+    reader = csv.reader(lines, strict=True)
+    while True:
+        start = reader.line_num + 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield start, None, f"invalid CSV: {e}"
+            continue
+        yield start, row, None
+
+
+def iter_records(lines: Iterable[str], fmt: str) -> Iterator[dict]:
+    """Parse JSONL or CSV lines into records; malformed input yields records with an error"""
+    if fmt == "csv":
+        header = None
+        for line_no, row, error in _csv_rows(lines):
+            if error is not None:
+                yield _error(line_no, error)
+                continue
+            if header is None:
+                header = [h.strip().lower() for h in row]
+                continue
+            if not any(cell.strip() for cell in row):
+                continue
+            yield _to_record(dict(zip(header, row)), line_no)
+    else:
+        for line_no, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield _error(line_no, f"invalid JSON: {e}")
+                continue
+            if not isinstance(row, dict):
+                yield _error(line_no, "expected a JSON object")
+                continue
+            yield _to_record(row, line_no)
+
+
+def classify_chunk(records: List[dict]) -> List[str]:
+    """Classify a chunk of records; returns NDJSON lines. Runs in a worker process."""
+    out = []
+    for record in records:
+        if "error" in record:
+            result = record
+        elif not record.get("system_description"):
+            result = {"id": record["id"], "line": record["line"], "error": "missing system_description"}
+        else:
+            # One bad record must not take the rest of the chunk down with it
+            try:
+                result = {
+                    "id": record["id"],
+                    "line": record["line"],
+                    **classify_system(record["system_description"], record["features"]),
+                }
+            except Exception as e:
+                result = {"id": record["id"], "line": record["line"], "error": f"classification failed: {e}"}
+        out.append(json.dumps(result, ensure_ascii=False) + "\n")
+    return out
+
+
+def _chunks(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def classify_stream(records: Iterable[dict], executor: Executor,
+                    chunk_size: int = BATCH_CHUNK_SIZE,
+                    max_pending: int = BATCH_MAX_PENDING) -> Iterator[str]:
+    """Yield NDJSON lines in input order with at most max_pending chunks in flight"""
+    pending = deque()
+    for chunk in _chunks(records, chunk_size):
+        pending.append(executor.submit(classify_chunk, chunk))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+async def classify_stream_async(records: Iterable[dict], executor: Executor,
+                                chunk_size: int = BATCH_CHUNK_SIZE,
+                                max_pending: int = BATCH_MAX_PENDING) -> AsyncIterator[str]:
+    """
+    Async variant of classify_stream for StreamingResponse. Reading and
+    parsing `records` blocks too, so each chunk is pulled on a thread.
+    """
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    chunks = _chunks(records, chunk_size)
+    reading = None
+    try:
+        while True:
+            reading = loop.run_in_executor(None, next, chunks, None)
+            chunk = await reading
+            if chunk is None:
+                break
+            pending.append(loop.run_in_executor(executor, classify_chunk, chunk))
+            if len(pending) >= max_pending:
+                for line in await pending.popleft():
+                    yield line
+        while pending:
+            for line in await pending.popleft():
+                yield line
+    finally:
+        for future in pending:
+            future.cancel()
+        if reading is not None and not reading.done():
+            # The caller closes the input next; let the read in progress finish first
+            await asyncio.wait({reading})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL or CSV file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default: from file extension)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    parser.add_argument("--max-pending", type=int, default=BATCH_MAX_PENDING)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.input)
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    count = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for line in classify_stream(iter_records(src, fmt), executor, args.chunk_size, args.max_pending):
+                dst.write(line)
+                count += 1
+                if count % args.chunk_size == 0:
+                    dst.flush()
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"✅ Classified {count} records", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
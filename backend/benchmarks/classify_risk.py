@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: compiled rule matcher vs. the previous classify_risk.
+
+"legacy" is the original implementation (hard-coded lists, one
+`keyword in text` scan per keyword and tier). "legacy (full table)" applies
+the same per-keyword scanning to the full rule table, which is what the
+old approach would cost once the vocabulary grows. "compiled" is the
+single-pass matcher used by tools.classify_risk.
+
+Usage (from backend/):
+    python benchmarks/classify_risk.py --sizes 1000 20000 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from risk_rules import RISK_MATCHER  # noqa: E402
+
+_LEGACY_TIERS = [
+    ("High Risk", ["biometric", "police", "surveillance", "safety component", "education", "employment"]),
+    ("Limited Risk", ["chatbot", "deepfake", "emotion recognition", "manipulation"]),
+    ("Minimal Risk", ["spam", "game", "filter", "inventory"]),
+]
+
+_FULL_TIERS = [
+    (tier["risk_level"], [term.rstrip("*").lower() for term in tier["terms"]])
+    for tier in RISK_MATCHER.tiers
+]
+
+
+def legacy_classify(text: str, tiers=_LEGACY_TIERS) -> str:
+    description_lower = text.lower()
+    for risk_level, keywords in tiers:
+        if any(keyword in description_lower for keyword in keywords):
+            return risk_level
+    return "Unclassified / Minimal Risk"
+
+
+def legacy_all_terms(text: str, tiers=_FULL_TIERS) -> list:
+    """Old approach extended to report every matched term, as the compiled matcher does"""
+    description_lower = text.lower()
+    return [(kw, level) for level, keywords in tiers for kw in keywords if kw in description_lower]
+
+
+_FILLER = (
+    "The provider documents the intended purpose, training data sources, evaluation "
+    "metrics and post-market monitoring plan of the system in accordance with the "
+    "quality management procedures of the organisation. "
+).split()
+
+
+def make_document(size: int, seed: int = 7) -> str:
+    """Technical-documentation-like text of about `size` characters, with a few rule terms near the end"""
+    rng = random.Random(seed)
+    words, length = [], 0
+    while length < size:
+        word = rng.choice(_FILLER)
+        words.append(word)
+        length += len(word) + 1
+    words.extend(["customer", "chatbot", "for", "inventory", "questions"])
+    return " ".join(words)
+
+
+def bench(size: int, repeat: int) -> None:
+    text = make_document(size)
+    number = max(1, 200000 // max(size, 1))
+    cases = [
+        ("legacy", lambda: legacy_classify(text)),
+        ("legacy (full table)", lambda: legacy_all_terms(text)),
+        ("compiled", lambda: RISK_MATCHER.classify(text)),
+    ]
+    print(f"\n{size:>8} chars, {sum(len(t) for _, t in _FULL_TIERS)} terms in table")
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+        print(f"  {name:<20} {best * 1e6:10.1f} µs/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000, 200000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Cold-start benchmark: import time of main.py and time to the first /health.
+
+Each sample runs in a fresh interpreter, like a serverless cold start:
+- import: `import main` alone (what every cold invocation pays)
+- first_health: process start to the first 200 from /health under uvicorn
+  (interpreter start, imports, app startup; warm-up runs in the background)
+- first_client: building the OpenAI client on first use (SDK import)
+
+The OpenAI base URL points at a closed local port, so the background
+warm-up fails fast instead of reaching the network. Also lists the
+slowest modules imported directly by main.
+
+Usage (from backend/):
+    python benchmarks/cold_start.py --runs 5
+    python benchmarks/cold_start.py --json > cold_start.json
+    python benchmarks/cold_start.py --budget-import 0.8 --budget-health 2.5   # non-zero exit when over
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.get_client()
+print(imported - started, time.perf_counter() - imported)
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-fake")
+    env["OPENAI_BASE_URL"] = "http://127.0.0.1:9/v1"  # closed port: warm-up fails fast, offline
+    env["ASSISTANT_STATE_PATH"] = os.path.join(tempfile.mkdtemp(), "assistant_state.json")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import() -> List[float]:
+    """[import seconds, first client seconds] in a fresh interpreter"""
+    out = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET], cwd=BACKEND_DIR, env=_env(),
+                         capture_output=True, text=True, check=True).stdout
+    return [float(v) for v in out.strip().splitlines()[-1].split()]
+
+
+def measure_first_health(timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("server did not answer /health")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def slowest_imports(limit: int = 10) -> List[dict]:
+    """Modules imported directly by main, by cumulative import time"""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                         env=_env(), capture_output=True, text=True, check=True).stderr
+    entries: List[dict] = []
+    children: List[dict] = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # One separator space, then two per nesting level; a module is listed after its imports
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            children.append({"module": name.strip(), "seconds": int(cumulative) / 1e6})
+        elif depth == 0:
+            if name.strip() == "main":
+                entries = children
+            children = []
+    entries.sort(key=lambda e: e["seconds"], reverse=True)
+    return entries[:limit]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "median": round(statistics.median(values), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--budget-import", type=float, help="fail if median import time exceeds this (seconds)")
+    parser.add_argument("--budget-health", type=float, help="fail if median time to first /health exceeds this")
+    args = parser.parse_args()
+
+    imports, clients, health = [], [], []
+    for _ in range(args.runs):
+        imported, client = measure_import()
+        imports.append(imported)
+        clients.append(client)
+        health.append(measure_first_health())
+
+    report = {
+        "runs": args.runs,
+        "python": sys.version.split()[0],
+        "import": summarize(imports),
+        "first_health": summarize(health),
+        "first_client": summarize(clients),
+        "slowest_imports": slowest_imports(),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        ms = lambda v: f"{v * 1000:.0f}ms"  # noqa: E731
+        for name in ("import", "first_health", "first_client"):
+            s = report[name]
+            print(f"{name:>12}: median={ms(s['median'])} min={ms(s['min'])} max={ms(s['max'])}")
+        print("slowest direct imports of main:")
+        for entry in report["slowest_imports"]:
+            print(f"  {entry['module']:<24} {ms(entry['seconds'])}")
+
+    ok = True
+    if args.budget_import is not None and report["import"]["median"] > args.budget_import:
+        print(f"❌ import time above {args.budget_import}s")
+        ok = False
+    if args.budget_health is not None and report["first_health"]["median"] > args.budget_health:
+        print(f"❌ time to first /health above {args.budget_health}s")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main_cli()
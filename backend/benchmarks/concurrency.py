@@ -0,0 +1,108 @@
+"""
+Concurrency check for /api/chat/stream against the fake Assistants backend.
+
+Opens N chat streams at once and keeps probing /health while they run.
+With a non-blocking pipeline the wall time stays close to a single
+answer and /health stays responsive; a blocking client would serialize
+the streams and make both grow linearly with N.
+
+Usage (from backend/):
+    python benchmarks/concurrency.py --streams 200
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+# Measure the pipeline, not admission control (set these to exercise the limits)
+os.environ.setdefault("CHAT_MAX_ACTIVE", "0")
+os.environ.setdefault("CHAT_RATE_PER_MINUTE", "0")
+# Keep fake assistant IDs out of the real assistant state file
+os.environ["ASSISTANT_STATE_PATH"] = os.path.join(tempfile.mkdtemp(), "assistant_state.json")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from benchmarks.fakes import FakeAsyncOpenAI  # noqa: E402
+
+
+async def _one_stream(http: httpx.AsyncClient) -> Tuple[int, int]:
+    """(SSE frames, text tokens) received; frames are fewer than tokens when deltas are coalesced"""
+    frames = 0
+    tokens = 0
+    async with http.stream("POST", "/api/chat/stream", json={"message": "What is Article 11?"}) as resp:
+        async for line in resp.aiter_lines():
+            if line.startswith("data: "):
+                frames += 1
+                if line != "data: [DONE]":
+                    event = json.loads(line[6:])
+                    if event["type"] == "text":
+                        tokens += event["content"].count("tok")
+    return frames, tokens
+
+
+async def _probe_health(http: httpx.AsyncClient, stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await http.get("/health")
+        samples.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.02)
+
+
+async def run(streams: int, tokens: int, token_delay: float, verbose: bool = False) -> bool:
+    fake = FakeAsyncOpenAI(tokens_per_answer=tokens, token_delay=token_delay)
+    main.client = fake
+    main.GLOBAL_ASSISTANT_ID = None
+    await main.get_singleton_assistant()
+
+    single_answer = fake.first_token_delay + tokens * token_delay + 3 * fake.api_latency
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        stop = asyncio.Event()
+        health = []
+        probe = asyncio.create_task(_probe_health(http, stop, health))
+
+        # The app logs every thread/tool call; keep the report readable
+        log_sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with log_sink:
+            t0 = time.perf_counter()
+            counts = await asyncio.gather(*[_one_stream(http) for _ in range(streams)])
+            wall = time.perf_counter() - t0
+
+        stop.set()
+        await probe
+
+    health.sort()
+    worst = health[-1] if health else 0.0
+    print(f"streams={streams} wall={wall:.2f}s single_answer~{single_answer:.2f}s "
+          f"frames={sum(f for f, _ in counts)} health_max={worst * 1000:.1f}ms")
+
+    # Everything runs in this one process, so per-frame CPU adds up at 200 streams;
+    # serialized streams would take about streams * single_answer instead
+    ok = all(t == tokens for _, t in counts) and wall < single_answer * 5
+    print("✅ streams ran concurrently" if ok else "❌ streams were serialized or incomplete")
+    return ok
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--verbose", action="store_true", help="show app logs")
+    args = parser.parse_args()
+    ok = asyncio.run(run(args.streams, args.tokens, args.token_delay, args.verbose))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main_cli()
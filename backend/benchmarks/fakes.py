@@ -0,0 +1,301 @@
+"""
+Local stand-ins for the OpenAI Assistants API and Tavily used by the benchmark scripts.
+
+The fakes mirror only the parts of `AsyncOpenAI` and `TavilyClient` that
+the backend touches and wait with real sleeps, so they behave like slow
+network peers without needing API keys.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Callable, List, Optional, Union
+
+_ids = itertools.count(1)
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_fake{next(_ids)}"
+
+
+def _not_found(message: str):
+    """The openai.NotFoundError the SDK raises for a 404"""
+    import httpx
+    from openai import NotFoundError
+
+    response = httpx.Response(404, request=httpx.Request("POST", "https://api.openai.com/v1"))
+    return NotFoundError(message, response=response, body=None)
+
+
+def _event(name: str, data) -> SimpleNamespace:
+    return SimpleNamespace(event=name, data=data)
+
+
+def _message(thread_id: str, role: str, text: str, run_id: Optional[str] = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=_new_id("msg"), thread_id=thread_id, role=role, created_at=int(time.time()), status="completed",
+        run_id=run_id, attachments=[],
+        content=[SimpleNamespace(type="text", text=SimpleNamespace(value=text, annotations=[]))],
+    )
+
+
+def _text_delta(text: str) -> SimpleNamespace:
+    part = SimpleNamespace(type="text", text=SimpleNamespace(value=text))
+    return _event("thread.message.delta", SimpleNamespace(delta=SimpleNamespace(content=[part])))
+
+
+class FakeRunStream:
+    """Async iterator of run events, pausing for tool calls while the run has tool rounds left."""
+
+    def __init__(self, backend: "FakeAsyncOpenAI", run_id: str, new_run: bool = True):
+        self._backend = backend
+        self._run_id = run_id
+        self._new_run = new_run
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        backend = self._backend
+        run = backend.runs[self._run_id]
+        if self._new_run:
+            yield _event("thread.run.created", SimpleNamespace(id=self._run_id, status="queued"))
+        await asyncio.sleep(backend.first_token_delay)
+        if run["status"] == "cancelled":
+            yield _event("thread.run.cancelled", SimpleNamespace(id=self._run_id, status="cancelled"))
+            return
+        if run["rounds_left"] > 0 and run["tool_calls"]:
+            run["rounds_left"] -= 1
+            calls = [
+                SimpleNamespace(
+                    id=_new_id("call"),
+                    type="function",
+                    function=SimpleNamespace(name=c["name"], arguments=json.dumps(c["arguments"])),
+                )
+                for c in run["tool_calls"]
+            ]
+            run = SimpleNamespace(
+                id=self._run_id,
+                status="requires_action",
+                required_action=SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=calls)),
+            )
+            yield _event("thread.run.requires_action", run)
+            return
+        for i in range(backend.tokens_per_answer):
+            yield _text_delta(f"tok{i} ")
+            await asyncio.sleep(backend.token_delay)
+        status = backend.final_status
+        run["status"] = status
+        if status == "completed":
+            answer = "".join(f"tok{i} " for i in range(backend.tokens_per_answer))
+            backend.messages.setdefault(run["thread_id"], []).append(
+                _message(run["thread_id"], "assistant", answer, self._run_id)
+            )
+        last_error = SimpleNamespace(code="server_error", message="Fake failure") if status == "failed" else None
+        # Rough usage: a fixed prompt per round plus one token per delta
+        prompt_tokens = backend.prompt_tokens * (backend.tool_rounds + 1 if run["tool_calls"] else 1)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=backend.tokens_per_answer,
+                                total_tokens=prompt_tokens + backend.tokens_per_answer)
+        yield _event(f"thread.run.{status}",
+                     SimpleNamespace(id=self._run_id, status=status, last_error=last_error, usage=usage))
+
+    # Context-manager protocol used by submit_tool_outputs_stream
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Assistants:
+    def __init__(self, backend):
+        self._backend = backend
+        self._items = []
+
+    async def list(self, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        return SimpleNamespace(data=list(self._items))
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        assistant = SimpleNamespace(id=_new_id("asst"), **kwargs)
+        self._items.insert(0, assistant)
+        return assistant
+
+    async def update(self, assistant_id, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        if assistant_id in self._backend.deleted_assistants:
+            raise _not_found(f"No assistant found with id '{assistant_id}'.")
+        for assistant in self._items:
+            if assistant.id == assistant_id:
+                vars(assistant).update(kwargs)
+                return assistant
+        return SimpleNamespace(id=assistant_id, **kwargs)
+
+
+class _Messages:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def create(self, thread_id, role, content, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        message = _message(thread_id, role, content)
+        self._backend.messages.setdefault(thread_id, []).append(message)
+        return message
+
+    async def list(self, thread_id, order="desc", after=None, limit=20, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        messages = list(self._backend.messages.get(thread_id, []))
+        if order == "desc":
+            messages.reverse()
+        if after is not None:
+            ids = [m.id for m in messages]
+            messages = messages[ids.index(after) + 1:] if after in ids else []
+        return SimpleNamespace(data=messages[:limit], has_more=len(messages) > limit)
+
+
+class _Runs:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def create(self, thread_id, assistant_id, stream=False, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        if assistant_id in self._backend.deleted_assistants:
+            raise _not_found(f"No assistant found with id '{assistant_id}'.")
+        run_id = _new_id("run")
+        self._backend.runs[run_id] = {
+            "thread_id": thread_id,
+            "status": "in_progress",
+            "tool_calls": self._backend.next_tool_calls(),
+            "rounds_left": self._backend.tool_rounds,
+            "options": kwargs,
+        }
+        return FakeRunStream(self._backend, run_id)
+
+    def submit_tool_outputs_stream(self, thread_id, run_id, tool_outputs, **kwargs):
+        self._backend.submitted.append((run_id, tool_outputs))
+        return FakeRunStream(self._backend, run_id, new_run=False)
+
+    async def cancel(self, run_id, thread_id=None, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        self._backend.runs[run_id]["status"] = "cancelled"
+        self._backend.cancelled.append(run_id)
+        return SimpleNamespace(id=run_id, status="cancelling")
+
+
+class _Threads:
+    def __init__(self, backend):
+        self._backend = backend
+        self.messages = _Messages(backend)
+        self.runs = _Runs(backend)
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        return SimpleNamespace(id=_new_id("thread"))
+
+    async def delete(self, thread_id, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        return SimpleNamespace(id=thread_id, deleted=True)
+
+
+class _Completions:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def create(self, model, messages, **kwargs):
+        await asyncio.sleep(self._backend.api_latency)
+        self._backend.completions.append(messages)
+        message = SimpleNamespace(content=f"- summary {len(self._backend.completions)} of earlier turns")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class _Files:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def create(self, file, purpose):
+        await asyncio.sleep(self._backend.api_latency)
+        return SimpleNamespace(id=_new_id("file"), purpose=purpose)
+
+
+class FakeAsyncOpenAI:
+    """
+    Drop-in replacement for `main.client`.
+
+    tokens_per_answer / token_delay control the streaming rate,
+    first_token_delay simulates model think time and api_latency is
+    applied to every non-streaming call. tool_calls, if set, makes a run
+    stop once with requires_action for those function calls: either a
+    fixed list of {"name", "arguments"} dicts or a callable returning one
+    per run. tool_call_rate is the share of runs that call tools and
+    tool_rounds how many requires_action rounds such a run goes through.
+    final_status is the last event of every run ("completed", "failed",
+    "expired", ...) and reports prompt_tokens per model round as usage;
+    runs.create() options are kept in `runs`. Cancelled run IDs are recorded in `cancelled`; user
+    messages and completed answers are kept per thread in `messages`.
+    Assistant IDs in `deleted_assistants` get a 404 from update and runs.create.
+    """
+
+    def __init__(self, tokens_per_answer: int = 50, token_delay: float = 0.01,
+                 first_token_delay: float = 0.2, api_latency: float = 0.05,
+                 tool_calls: Union[List[dict], Callable[[], List[dict]], None] = None,
+                 tool_call_rate: float = 1.0, tool_rounds: int = 1,
+                 final_status: str = "completed", prompt_tokens: int = 1500, seed: Optional[int] = None):
+        self.tokens_per_answer = tokens_per_answer
+        self.token_delay = token_delay
+        self.first_token_delay = first_token_delay
+        self.api_latency = api_latency
+        self.tool_calls = tool_calls or []
+        self.tool_call_rate = tool_call_rate
+        self.tool_rounds = tool_rounds
+        self.final_status = final_status
+        self.prompt_tokens = prompt_tokens
+        self.completions = []
+        self.runs = {}
+        self.messages = {}  # thread_id -> messages, oldest first
+        self.submitted = []
+        self.cancelled = []
+        self.deleted_assistants = set()  # IDs answered with a 404, like assistants deleted on the account
+        self._random = random.Random(seed)
+        self.files = _Files(self)
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.beta = SimpleNamespace(assistants=_Assistants(self), threads=_Threads(self))
+
+    def next_tool_calls(self) -> List[dict]:
+        """Tool calls for the next run (empty when this run answers directly)"""
+        if not self.tool_calls or self._random.random() >= self.tool_call_rate:
+            return []
+        return self.tool_calls() if callable(self.tool_calls) else self.tool_calls
+
+
+class FakeTavilyClient:
+    """
+    Drop-in replacement for `tools.tavily_client`.
+
+    search() blocks for `latency` seconds (it runs on the tool thread pool,
+    like the real client) and returns `results` hits on the allowed domains.
+    """
+
+    def __init__(self, latency: float = 0.8, results: int = 5):
+        self.latency = latency
+        self.results = results
+        self.calls = 0
+
+    def search(self, query, search_depth="basic", include_domains=None, max_results=5, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        domains = include_domains or ["eur-lex.europa.eu"]
+        return {
+            "results": [
+                {
+                    "title": f"{query} ({i + 1})",
+                    "url": f"https://{domains[i % len(domains)]}/doc/{i + 1}",
+                    "content": f"Excerpt {i + 1} about {query}. " * 20,
+                    "score": round(1 - i * 0.1, 2),
+                }
+                for i in range(min(self.results, max_results))
+            ]
+        }
@@ -0,0 +1,294 @@
+"""
+Load test for /api/chat/stream against fake Assistants and Tavily backends.
+
+Starts the app under uvicorn in a child process with `main.client` and
+`tools.tavily_client` swapped for the fakes in benchmarks/fakes.py, then
+drives N concurrent SSE clients over real HTTP. Reports throughput,
+time-to-first-token and total latency percentiles, and the server's
+resident memory per open stream.
+
+Usage (from backend/):
+    python benchmarks/load.py --clients 100 --rounds 3
+    python benchmarks/load.py --clients 200 --tool-pattern search --tool-rate 0.3
+    python benchmarks/load.py --json > before.json        # compare across commits
+    python benchmarks/load.py --fail-ttft-p99 1.5         # non-zero exit on regression
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TOOL_PATTERNS = ("none", "classify", "search", "mixed")
+
+
+def _tool_calls(pattern: str, query_space: int):
+    """Callable producing the tool calls of one run for a --tool-pattern"""
+    def classify():
+        return {"name": "classify_risk",
+                "arguments": {"system_description": "CV screening tool that ranks job applicants"}}
+
+    def search():
+        # A bounded query space gives a realistic mix of cache hits and misses
+        article = random.randint(1, query_space)
+        return {"name": "search_web", "arguments": {"query": f"AI Act Article {article} obligations"}}
+
+    if pattern == "none":
+        return None
+    if pattern == "classify":
+        return lambda: [classify()]
+    if pattern == "search":
+        return lambda: [search()]
+    return lambda: [classify(), search()]
+
+
+# --- Server side (child process) ---
+
+def serve(args) -> None:
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    os.environ.setdefault("TAVILY_API_KEY", "tvly-fake")
+    # Measure the pipeline, not admission control (set these to exercise the limits)
+    os.environ.setdefault("CHAT_MAX_ACTIVE", "0")
+    os.environ.setdefault("CHAT_RATE_PER_MINUTE", "0")
+    # Keep fake assistant IDs out of the real assistant state file
+    os.environ["ASSISTANT_STATE_PATH"] = os.path.join(tempfile.mkdtemp(), "assistant_state.json")
+
+    import uvicorn
+
+    import main
+    import tools
+    from benchmarks.fakes import FakeAsyncOpenAI, FakeTavilyClient
+
+    random.seed(args.seed)
+    main.client = FakeAsyncOpenAI(
+        tokens_per_answer=args.tokens,
+        token_delay=args.token_delay,
+        first_token_delay=args.first_token_delay,
+        api_latency=args.api_latency,
+        tool_calls=_tool_calls(args.tool_pattern, args.query_space),
+        tool_call_rate=args.tool_rate,
+        seed=args.seed,
+    )
+    tools.tavily_client = FakeTavilyClient(latency=args.search_latency)
+
+    if not args.verbose:
+        # The app logs every thread/tool call; keep the child quiet
+        sys.stdout = open(os.devnull, "w")
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+# --- Client side ---
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of a process (Linux /proc only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def _one_stream(http, message: str, coalesce: bool = True) -> dict:
+    start = time.perf_counter()
+    first_text = None
+    frames = 0
+    text_frames = 0
+    error = None
+    async with http.stream("POST", "/api/chat/stream", json={"message": message, "coalesce": coalesce}) as resp:
+        async for line in resp.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            frames += 1
+            payload = line[6:]
+            if payload == "[DONE]":
+                break
+            event = json.loads(payload)
+            if event.get("type") == "text":
+                text_frames += 1
+                if first_text is None:
+                    first_text = time.perf_counter()
+            elif event.get("type") == "error":
+                error = event.get("content")
+    end = time.perf_counter()
+    return {
+        "ttft": first_text - start if first_text else None,
+        "total": end - start,
+        "frames": frames,
+        "text_frames": text_frames,
+        "error": error,
+    }
+
+
+async def _client(http, rounds: int, coalesce: bool, results: list) -> None:
+    for i in range(rounds):
+        message = f"What does the AI Act require for high-risk systems? ({i})"
+        results.append(await _one_stream(http, message, coalesce))
+
+
+async def _sample_memory(pid: int, stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        rss = _rss_bytes(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(0.05)
+
+
+async def _wait_ready(http, proc, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            resp = await http.get("/health")
+            if resp.status_code == 200 and resp.json().get("assistant_id"):
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not become ready")
+
+
+async def drive(args, port: int, proc) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=None) as http:
+        await _wait_ready(http, proc)
+        # One warm-up stream so imports and first-use allocations are not counted per stream
+        await _one_stream(http, "warm-up")
+        baseline = _rss_bytes(proc.pid)
+
+        stop = asyncio.Event()
+        memory: List[int] = []
+        sampler = asyncio.ensure_future(_sample_memory(proc.pid, stop, memory))
+
+        results: list = []
+        started = time.perf_counter()
+        await asyncio.gather(*[_client(http, args.rounds, not args.no_coalesce, results) for _ in range(args.clients)])
+        wall = time.perf_counter() - started
+
+        stop.set()
+        await sampler
+
+    ttft = [r["ttft"] for r in results if r["ttft"] is not None]
+    totals = [r["total"] for r in results]
+    text_frames = sum(r["text_frames"] for r in results)
+    peak = max(memory) if memory else None
+    report = {
+        "clients": args.clients,
+        "streams": len(results),
+        "errors": sum(1 for r in results if r["error"] or r["ttft"] is None),
+        "wall_seconds": round(wall, 3),
+        "streams_per_second": round(len(results) / wall, 2),
+        "text_frames_per_second": round(text_frames / wall, 1),
+        "ttft": {p: _round(percentile(ttft, q)) for p, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))},
+        "total": {p: _round(percentile(totals, q)) for p, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))},
+        "rss_baseline_mb": _mb(baseline),
+        "rss_peak_mb": _mb(peak),
+        "kb_per_stream": round((peak - baseline) / args.clients / 1024, 1) if peak and baseline else None,
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "serve", "port", "verbose")},
+    }
+    return report
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+
+def _print_report(report: dict) -> None:
+    ms = lambda v: f"{v * 1000:.0f}ms" if v is not None else "n/a"  # noqa: E731
+    print(f"streams={report['streams']} clients={report['clients']} errors={report['errors']} "
+          f"wall={report['wall_seconds']:.2f}s")
+    print(f"throughput: {report['streams_per_second']} streams/s, {report['text_frames_per_second']} text frames/s")
+    for name in ("ttft", "total"):
+        p = report[name]
+        print(f"{name:>5}: p50={ms(p['p50'])} p90={ms(p['p90'])} p99={ms(p['p99'])} max={ms(p['max'])}")
+    if report["kb_per_stream"] is not None:
+        print(f"  rss: baseline={report['rss_baseline_mb']}MB peak={report['rss_peak_mb']}MB "
+              f"(~{report['kb_per_stream']}KB per concurrent stream)")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100, help="concurrent SSE clients")
+    parser.add_argument("--rounds", type=int, default=1, help="sequential chats per client")
+    parser.add_argument("--tokens", type=int, default=50, help="text deltas per answer")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between text deltas")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="model think time")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="latency of non-streaming API calls")
+    parser.add_argument("--tool-pattern", choices=TOOL_PATTERNS, default="none")
+    parser.add_argument("--tool-rate", type=float, default=1.0, help="share of runs that call tools")
+    parser.add_argument("--search-latency", type=float, default=0.8, help="fake Tavily latency")
+    parser.add_argument("--query-space", type=int, default=50, help="distinct search queries")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-coalesce", action="store_true", help="one SSE frame per text delta")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--fail-ttft-p99", type=float, help="exit non-zero if TTFT p99 exceeds this (seconds)")
+    parser.add_argument("--verbose", action="store_true", help="show app logs")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    port = _free_port()
+    forwarded = [a for a in sys.argv[1:] if a not in ("--json",)]
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port)] + forwarded,
+        cwd=BACKEND_DIR
+    )
+    try:
+        report = asyncio.run(drive(args, port, proc))
+    finally:
+        proc.terminate()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            proc.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+    ok = report["errors"] == 0
+    if args.fail_ttft_p99 is not None and (report["ttft"]["p99"] or float("inf")) > args.fail_ttft_p99:
+        print(f"❌ TTFT p99 above {args.fail_ttft_p99}s")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,139 @@
+"""
+Bounded context for chat runs on long threads.
+
+Every turn appends to the same OpenAI thread, so without limits each run
+sends more context than the last. run_options() bounds a run:
+- truncation_strategy keeps only the last CONTEXT_LAST_MESSAGES messages
+  (0 leaves OpenAI's "auto" strategy),
+- RUN_MAX_PROMPT_TOKENS / RUN_MAX_COMPLETION_TOKENS cap the run's token
+  budgets (0 = no cap; a run over budget ends "incomplete").
+
+With CONTEXT_SUMMARY on, ContextSummaries keeps a rolling note of the
+turns that fell out of the window: after a completed run the dropped
+messages (read through the thread history cache) are folded into the
+note by a small model in the background, and the next run receives it as
+additional_instructions. Notes live in memory, per thread.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from history import ThreadHistory
+from prompts import ATTACHED_FILES_TEMPLATE, CONTEXT_NOTE_TEMPLATE, CONTEXT_SUMMARY_INSTRUCTIONS
+
+CONTEXT_LAST_MESSAGES = int(os.getenv("CONTEXT_LAST_MESSAGES", "20"))
+RUN_MAX_PROMPT_TOKENS = int(os.getenv("RUN_MAX_PROMPT_TOKENS", "0"))
+RUN_MAX_COMPLETION_TOKENS = int(os.getenv("RUN_MAX_COMPLETION_TOKENS", "0"))
+
+CONTEXT_SUMMARY_ENABLED = os.getenv("CONTEXT_SUMMARY", "false").lower() in ("1", "true", "yes")
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4o-mini")
+CONTEXT_SUMMARY_MAX_CHARS = int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "2000"))
+# Summarize once at least this many messages have dropped out of the window
+CONTEXT_SUMMARY_BATCH = int(os.getenv("CONTEXT_SUMMARY_BATCH", "6"))
+CONTEXT_SUMMARY_THREADS = int(os.getenv("CONTEXT_SUMMARY_THREADS", "1000"))
+# Characters of each dropped message passed to the summarizer
+_MESSAGE_CHARS = 4000
+
+
+def run_options(note: Optional[str] = None, file_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Extra runs.create() arguments bounding the run's context and output.
+    `file_ids` (attached files whose text local tools can read, see
+    ingest.readable_file_ids) are named in the instructions, since
+    attachments alone never show the model an ID to pass to classify_risk.
+    """
+    options: Dict[str, Any] = {}
+    if CONTEXT_LAST_MESSAGES > 0:
+        options["truncation_strategy"] = {"type": "last_messages", "last_messages": CONTEXT_LAST_MESSAGES}
+    if RUN_MAX_PROMPT_TOKENS > 0:
+        options["max_prompt_tokens"] = RUN_MAX_PROMPT_TOKENS
+    if RUN_MAX_COMPLETION_TOKENS > 0:
+        options["max_completion_tokens"] = RUN_MAX_COMPLETION_TOKENS
+    instructions = []
+    if note:
+        instructions.append(CONTEXT_NOTE_TEMPLATE.format(note=note))
+    if file_ids:
+        instructions.append(ATTACHED_FILES_TEMPLATE.format(file_ids=", ".join(file_ids)))
+    if instructions:
+        options["additional_instructions"] = "\n\n".join(instructions)
+    return options
+
+
+class ContextSummaries:
+    """Rolling per-thread notes of the turns outside the truncation window"""
+
+    def __init__(self, get_client: Callable[[], Any], history: ThreadHistory,
+                 window: int = CONTEXT_LAST_MESSAGES, batch: int = CONTEXT_SUMMARY_BATCH,
+                 max_threads: int = CONTEXT_SUMMARY_THREADS):
+        self._get_client = get_client
+        self._history = history
+        self.window = window
+        self.batch = batch
+        self.max_threads = max_threads
+        self._notes: "OrderedDict[str, dict]" = OrderedDict()  # thread_id -> {"through", "note"}
+        self._running: Dict[str, asyncio.Task] = {}
+        self.summaries = 0
+        self.failures = 0
+        self.summarized_messages = 0
+
+    def note(self, thread_id: Optional[str]) -> Optional[str]:
+        entry = self._notes.get(thread_id) if thread_id else None
+        if entry is None:
+            return None
+        self._notes.move_to_end(thread_id)
+        return entry["note"]
+
+    def schedule(self, thread_id: str) -> None:
+        """Fold newly dropped turns into the thread's note in the background (one task per thread)"""
+        if self.window <= 0 or thread_id in self._running:
+            return
+        task = asyncio.ensure_future(self._update(thread_id))
+        self._running[thread_id] = task
+        task.add_done_callback(lambda _: self._running.pop(thread_id, None))
+
+    async def _update(self, thread_id: str) -> None:
+        try:
+            messages = await self._history.messages(thread_id)
+            dropped = messages[:-self.window] if len(messages) > self.window else []
+            entry = self._notes.get(thread_id) or {"through": None, "note": ""}
+            ids = [m["id"] for m in dropped]
+            start = ids.index(entry["through"]) + 1 if entry["through"] in ids else 0
+            new = dropped[start:]
+            if len(new) < self.batch:
+                return
+            note = await self._summarize(entry["note"], new)
+            self._notes[thread_id] = {"through": new[-1]["id"], "note": note}
+            self._notes.move_to_end(thread_id)
+            while len(self._notes) > self.max_threads:
+                self._notes.popitem(last=False)
+            self.summaries += 1
+            self.summarized_messages += len(new)
+            print(f"📝 Context note for {thread_id} now covers {start + len(new)} earlier messages")
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Context summary failed for {thread_id}: {e}")
+
+    async def _summarize(self, note: str, messages) -> str:
+        turns = "\n\n".join(f"{m['role'].upper()}: {m['content'][:_MESSAGE_CHARS]}" for m in messages)
+        response = await self._get_client().chat.completions.create(
+            model=CONTEXT_SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": CONTEXT_SUMMARY_INSTRUCTIONS.format(max_chars=CONTEXT_SUMMARY_MAX_CHARS)},
+                {"role": "user", "content": f"Current note:\n{note or '(empty)'}\n\nDropped turns:\n{turns}"},
+            ],
+            max_tokens=CONTEXT_SUMMARY_MAX_CHARS // 3,
+            temperature=0,
+        )
+        return (response.choices[0].message.content or "").strip()[:CONTEXT_SUMMARY_MAX_CHARS]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": CONTEXT_SUMMARY_ENABLED,
+            "notes": len(self._notes),
+            "running": len(self._running),
+            "summaries": self.summaries,
+            "summarized_messages": self.summarized_messages,
+            "failures": self.failures,
+        }
@@ -0,0 +1,102 @@
+"""
+Incremental cache of thread messages for the conversation history endpoint.
+
+Threads live only on OpenAI, so rebuilding a transcript means listing its
+messages. ThreadHistory keeps the messages it has already fetched per
+thread and on every read asks OpenAI only for messages after the newest
+cached one (`after` cursor, oldest first). Resuming a long conversation
+costs one small list call instead of paging through the whole thread.
+
+Only settled messages are cached: a message still being written by a run
+(status in_progress) and everything after it is returned but fetched
+again next time.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+
+from cache import SingleFlight
+
+HISTORY_CACHE_THREADS = int(os.getenv("HISTORY_CACHE_THREADS", "1000"))
+# Messages per OpenAI list call (the API maximum)
+HISTORY_FETCH_LIMIT = 100
+
+
+def simplify_message(message) -> Dict[str, Any]:
+    """JSON-friendly view of an OpenAI thread message"""
+    text = "".join(
+        part.text.value for part in (message.content or [])
+        if getattr(part, "type", None) == "text"
+    )
+    return {
+        "id": message.id,
+        "role": message.role,
+        "content": text,
+        "created_at": message.created_at,
+        "status": getattr(message, "status", None) or "completed",
+        "run_id": getattr(message, "run_id", None),
+        "file_ids": [a.file_id for a in (getattr(message, "attachments", None) or [])],
+    }
+
+
+class ThreadHistory:
+    """Per-thread message cache, least recently read threads evicted beyond max_threads"""
+
+    def __init__(self, get_client: Callable[[], Any], max_threads: int = HISTORY_CACHE_THREADS):
+        self._get_client = get_client
+        self.max_threads = max_threads
+        self._threads: "OrderedDict[str, List[dict]]" = OrderedDict()  # thread_id -> settled messages
+        self._flights = SingleFlight()
+        self.reads = 0
+        self.list_calls = 0
+        self.fetched_messages = 0
+        self.evictions = 0
+
+    async def messages(self, thread_id: str) -> List[dict]:
+        """All messages of a thread, oldest first; concurrent reads of one thread share a fetch"""
+        self.reads += 1
+        return await self._flights.do_async(thread_id, lambda: self._sync(thread_id))
+
+    async def _sync(self, thread_id: str) -> List[dict]:
+        settled = list(self._threads.get(thread_id, ()))
+        unsettled: List[dict] = []
+        after = settled[-1]["id"] if settled else None
+        client = self._get_client()
+        while True:
+            params = {"thread_id": thread_id, "order": "asc", "limit": HISTORY_FETCH_LIMIT}
+            if after:
+                params["after"] = after
+            page = await client.beta.threads.messages.list(**params)
+            self.list_calls += 1
+            self.fetched_messages += len(page.data)
+            for message in page.data:
+                item = simplify_message(message)
+                if unsettled or item["status"] == "in_progress":
+                    unsettled.append(item)
+                else:
+                    settled.append(item)
+            if not page.data or not getattr(page, "has_more", False):
+                break
+            after = page.data[-1].id
+
+        self._threads[thread_id] = settled
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+            self.evictions += 1
+        return settled + unsettled
+
+    def forget(self, thread_id: str) -> None:
+        self._threads.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "threads": len(self._threads),
+            "messages": sum(len(m) for m in self._threads.values()),
+            "max_threads": self.max_threads,
+            "reads": self.reads,
+            "list_calls": self.list_calls,
+            "fetched_messages": self.fetched_messages,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,189 @@
+"""
+Shared outbound HTTP transport for the OpenAI and Tavily clients.
+
+Every upstream gets one pooled keep-alive client built from the same
+settings: bounded pool sizes, explicit connect/read timeouts and retries
+with jittered exponential backoff on 429/5xx (Retry-After is honoured).
+
+- OpenAI: an httpx.AsyncClient (HTTP/2 when the `h2` package is installed).
+  Retries stay with the SDK, which already backs off with jitter and knows
+  which requests are safe to repeat; it is given HTTP_MAX_RETRIES.
+- Tavily (and other blocking callers): a requests.Session whose adapter
+  pools up to HTTP_MAX_KEEPALIVE connections per host and retries through
+  urllib3.
+
+stats() reports pool usage and connection churn for tuning the limits.
+httpx and requests are imported when the first client is built, so
+importing this module costs nothing on a cold start.
+"""
+
+import importlib.util
+import os
+import random
+import threading
+from collections import Counter
+from typing import Any, Dict
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# Max gap between bytes of a response; run streams can be quiet while the model works
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "30"))
+# Max wait for a free connection when the pool is at HTTP_MAX_CONNECTIONS
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+HTTP_RETRY_MAX_BACKOFF = float(os.getenv("HTTP_RETRY_MAX_BACKOFF", "8"))
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_ENABLED = (os.getenv("HTTP2", "true").lower() in ("1", "true", "yes")
+                 and importlib.util.find_spec("h2") is not None)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_async_clients: Dict[str, Any] = {}  # name -> httpx.AsyncClient
+_adapters: Dict[str, Any] = {}  # name -> PooledAdapter
+_counters: Dict[str, Counter] = {}
+_lock = threading.Lock()
+
+
+def _count(name: str, field: str) -> None:
+    with _lock:
+        _counters.setdefault(name, Counter())[field] += 1
+
+
+def http_timeout():
+    """httpx.Timeout from the HTTP_*_TIMEOUT settings"""
+    import httpx
+
+    return httpx.Timeout(
+        connect=HTTP_CONNECT_TIMEOUT, read=HTTP_READ_TIMEOUT, write=HTTP_WRITE_TIMEOUT, pool=HTTP_POOL_TIMEOUT
+    )
+
+
+def async_client(name: str):
+    """Pooled httpx.AsyncClient for upstream `name` (e.g. AsyncOpenAI(http_client=...))"""
+    import httpx
+
+    async def trace(event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            _count(name, "new_connections")
+        elif event == "connection.start_tls.complete":
+            _count(name, "tls_handshakes")
+
+    async def on_request(request) -> None:
+        request.extensions["trace"] = trace
+
+    async def on_response(response) -> None:
+        _count(name, "responses")
+        if response.status_code in RETRY_STATUSES:
+            _count(name, f"status_{response.status_code}")
+
+    client = httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=http_timeout(),
+        follow_redirects=True,
+        event_hooks={"request": [on_request], "response": [on_response]},
+    )
+    _async_clients[name] = client
+    return client
+
+
+def session(name: str):
+    """Pooled requests.Session for blocking callers (Tavily runs on the tool threads)"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class JitteredRetry(Retry):
+        """Full-jitter backoff, counting retries for this upstream"""
+
+        def get_backoff_time(self) -> float:
+            backoff = super().get_backoff_time()
+            return random.uniform(0, min(backoff, HTTP_RETRY_MAX_BACKOFF)) if backoff > 0 else 0.0
+
+        def increment(self, *args, **kwargs):
+            _count(name, "retries")
+            return super().increment(*args, **kwargs)
+
+    class PooledAdapter(HTTPAdapter):
+        """Keeps HTTP_CONNECT_TIMEOUT even when callers pass one overall timeout"""
+
+        def send(self, request, timeout=None, **kwargs):
+            if timeout is None:
+                timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+            elif isinstance(timeout, (int, float)):
+                timeout = (min(HTTP_CONNECT_TIMEOUT, timeout), timeout)
+            return super().send(request, timeout=timeout, **kwargs)
+
+    retry = JitteredRetry(
+        total=HTTP_MAX_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,  # Tavily searches are POSTs but read-only, so safe to repeat
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = PooledAdapter(pool_connections=4, pool_maxsize=HTTP_MAX_KEEPALIVE, max_retries=retry)
+    http = requests.Session()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    _adapters[name] = adapter
+    return http
+
+
+def _async_pool_stats(client) -> Dict[str, int]:
+    # httpcore internals; missing fields read as zero
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", None) or [])
+    idle = sum(1 for c in connections if c.is_idle())
+    return {"connections": len(connections), "idle": idle, "in_use": len(connections) - idle}
+
+
+def _adapter_pool_stats(adapter) -> Dict[str, int]:
+    stats = {"connections": 0, "idle": 0, "in_use": 0, "new_connections": 0}
+    pools = adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None or pool.pool is None:
+            continue
+        # The queue holds idle connections plus None placeholders for ones never opened
+        queued = list(pool.pool.queue)
+        idle = sum(1 for conn in queued if conn is not None)
+        in_use = pool.pool.maxsize - len(queued)
+        stats["connections"] += idle + in_use
+        stats["idle"] += idle
+        stats["in_use"] += in_use
+        stats["new_connections"] += pool.num_connections
+    return stats
+
+
+def stats() -> Dict[str, Any]:
+    """Flat pool stats per upstream: <name>_<field>"""
+    result: Dict[str, Any] = {"http2": HTTP2_ENABLED, "max_connections": HTTP_MAX_CONNECTIONS,
+                              "max_keepalive": HTTP_MAX_KEEPALIVE}
+    for name, client in list(_async_clients.items()):
+        for field, value in _async_pool_stats(client).items():
+            result[f"{name}_{field}"] = value
+    for name, adapter in list(_adapters.items()):
+        for field, value in _adapter_pool_stats(adapter).items():
+            result[f"{name}_{field}"] = value
+    with _lock:
+        for name, counts in _counters.items():
+            for field, value in counts.items():
+                result[f"{name}_{field}"] = value
+    return result
+
+
+async def aclose() -> None:
+    """Close every pooled client (app shutdown)"""
+    for client in list(_async_clients.values()):
+        await client.aclose()
+    for adapter in list(_adapters.values()):
+        adapter.close()
@@ -0,0 +1,186 @@
+"""
+Optional local ingestion of uploaded PDFs.
+
+Text is extracted page by page with PyPDF2 in a worker process, split into
+chunks with page metadata and cached by content hash, so local tools
+(e.g. classify_risk) can read an uploaded document right away instead of
+relying only on remote file_search.
+"""
+
+import asyncio
+import bisect
+import io
+import os
+import re
+from typing import List, Optional, Tuple
+
+from cache import build_cache
+
+# Run extraction for every PDF upload unless the request opts out (?extract=false)
+INGEST_LOCAL_DEFAULT = os.getenv("INGEST_LOCAL", "false").lower() in ("1", "true", "yes")
+INGEST_CHUNK_CHARS = int(os.getenv("INGEST_CHUNK_CHARS", "2000"))
+INGEST_MAX_PAGES = int(os.getenv("INGEST_MAX_PAGES", "1000"))
+INGEST_TIMEOUT = float(os.getenv("INGEST_TIMEOUT", "120"))
+# Cap on document text handed to local tools
+INGEST_TOOL_TEXT_CHARS = int(os.getenv("INGEST_TOOL_TEXT_CHARS", "200000"))
+
+# sha256 -> extracted document, "file:<file_id>" -> sha256
+DOCUMENT_STORE = build_cache(
+    ttl_seconds=float(os.getenv("INGEST_CACHE_TTL", str(7 * 24 * 3600))),
+    max_bytes=int(os.getenv("INGEST_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    path=os.getenv("INGEST_CACHE_PATH")
+)
+
+_BREAK = re.compile(r"\s")
+
+
+def is_pdf(head: bytes, filename: Optional[str] = None) -> bool:
+    return head.startswith(b"%PDF") or bool(filename and filename.lower().endswith(".pdf"))
+
+
+def _chunk_text(text: str, page_offsets: List[int], size: int) -> List[dict]:
+    """Split text into ~size character chunks on whitespace, tagging each with its page range"""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Back up to the last whitespace so words are not cut in half
+            window = text[start:end]
+            cut = max((m.start() for m in _BREAK.finditer(window, len(window) // 2)), default=None)
+            if cut:
+                end = start + cut
+        chunks.append({
+            "index": len(chunks),
+            "start": start,
+            "end": end,
+            "page_start": bisect.bisect_right(page_offsets, start),
+            "page_end": bisect.bisect_right(page_offsets, max(start, end - 1)),
+        })
+        start = end
+        while start < len(text) and text[start].isspace():
+            start += 1
+    return chunks
+
+
+def extract_pdf(source, chunk_chars: int = INGEST_CHUNK_CHARS, max_pages: int = INGEST_MAX_PAGES) -> dict:
+    """
+    Extract text page by page from a PDF path or bytes. Runs in a worker process.
+    Returns {"pages", "pages_extracted", "chars", "text", "chunks"}.
+    """
+    try:
+        from PyPDF2 import PdfReader  # imported here so cold starts don't pay for it
+    except ImportError:  # optional dependency
+        raise RuntimeError("PyPDF2 is not installed")
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    reader = PdfReader(source)
+    total_pages = len(reader.pages)
+    parts: List[str] = []
+    page_offsets: List[int] = []
+    offset = 0
+    for index, page in enumerate(reader.pages):
+        if index >= max_pages:
+            break
+        page_text = (page.extract_text() or "").strip()
+        page_offsets.append(offset)
+        parts.append(page_text)
+        offset += len(page_text) + 2  # "\n\n" separator
+    text = "\n\n".join(parts)
+    return {
+        "pages": total_pages,
+        "pages_extracted": len(parts),
+        "chars": len(text),
+        "text": text,
+        "chunks": _chunk_text(text, page_offsets, chunk_chars),
+    }
+
+
+def _summary(document: dict, cached: bool) -> dict:
+    """Upload response metadata (no text)"""
+    return {
+        "status": "extracted",
+        "cached": cached,
+        "pages": document["pages"],
+        "pages_extracted": document["pages_extracted"],
+        "chars": document["chars"],
+        "chunks": [
+            {
+                "index": c["index"],
+                "page_start": c["page_start"],
+                "page_end": c["page_end"],
+                "chars": c["end"] - c["start"],
+            }
+            for c in document["chunks"]
+        ],
+    }
+
+
+async def ingest_document(executor, digest: str, source, filename: Optional[str] = None) -> dict:
+    """
+    Extract (or reuse) a document's text by content hash.
+    `source` is a file path or the raw bytes. Returns metadata for the upload response.
+    """
+    document = DOCUMENT_STORE.get(digest)
+    if document is not None:
+        return _summary(document, cached=True)
+
+    loop = asyncio.get_running_loop()
+    try:
+        document = await asyncio.wait_for(
+            loop.run_in_executor(executor, extract_pdf, source),
+            timeout=INGEST_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        return {"status": "failed", "error": f"Extraction did not finish within {INGEST_TIMEOUT} seconds"}
+    except Exception as e:
+        print(f"   PDF extraction failed for {filename}: {e}")
+        return {"status": "failed", "error": str(e)}
+
+    document["filename"] = filename
+    DOCUMENT_STORE.set(digest, document)
+    print(f"📄 Extracted {document['pages_extracted']} pages ({document['chars']} chars) from {filename}")
+    return _summary(document, cached=False)
+
+
+def link_file_id(file_id: str, digest: str) -> None:
+    """Remember which extracted document belongs to an OpenAI file_id"""
+    DOCUMENT_STORE.set(f"file:{file_id}", digest)
+
+
+def get_document(file_id: str) -> Optional[dict]:
+    """Extracted document for an uploaded file_id, or None if it was not ingested locally"""
+    digest = DOCUMENT_STORE.get(f"file:{file_id}")
+    if digest is None:
+        return None
+    return DOCUMENT_STORE.get(digest)
+
+
+def get_document_text(file_id: str, max_chars: int = INGEST_TOOL_TEXT_CHARS) -> Optional[str]:
+    document = get_document(file_id)
+    if document is None:
+        return None
+    return document["text"][:max_chars]
+
+
+async def readable_file_ids(file_ids: Optional[List[str]]) -> List[str]:
+    """The file_ids whose extracted text local tools (classify_risk) can read"""
+    if not file_ids:
+        return []
+
+    def readable() -> List[str]:
+        return [file_id for file_id in file_ids if get_document_text(file_id, max_chars=1)]
+
+    if DOCUMENT_STORE.blocking:
+        return await asyncio.get_running_loop().run_in_executor(None, readable)
+    return readable()
+
+
+def get_chunk(file_id: str, index: int) -> Optional[Tuple[dict, str]]:
+    """(chunk metadata, chunk text) for one chunk of an ingested document"""
+    document = get_document(file_id)
+    if document is None or not 0 <= index < len(document["chunks"]):
+        return None
+    chunk = document["chunks"][index]
+    return chunk, document["text"][chunk["start"]:chunk["end"]]
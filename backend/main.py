@@ -1,18 +1,35 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, AsyncGenerator
-from openai import OpenAI
+from typing import List, Optional, Dict, Any, AsyncGenerator, Callable
 import os
+import io
 import json
 import asyncio
+import hashlib
+import tempfile
+import threading
+import time
 import traceback
 from datetime import datetime
 
 # Import tools and prompts
 from prompts import ASSISTANT_INSTRUCTIONS, ASSISTANT_NAME, ASSISTANT_MODEL, PROMPT_VERSION
-from tools import TOOLS, search_web_restricted, classify_risk
+from admission import CHAT_ADMISSION, CHAT_RATE_LIMITER, AdmissionRejected, Ticket, client_key
+from answer_cache import ANSWER_CACHE, ANSWER_CACHE_ENABLED
+from batch import classify_stream_async, detect_format, get_executor, iter_records
+from context import CONTEXT_SUMMARY_ENABLED, ContextSummaries, run_options
+from history import ThreadHistory
+from tools import TOOLS, SEARCH_CACHE, SEARCH_FLIGHTS, dispatch_tool_calls
+import http_clients
+import metrics
+from metrics import CHAT_REJECTED, UPLOAD_BYTES, UPLOAD_PHASE, RunTimings
+from ingest import INGEST_LOCAL_DEFAULT, ingest_document, is_pdf, link_file_id, readable_file_ids
+from replay import ReplayBuffers, ResumeError, parse_event_id
+from sse import SSE_FLUSH_INTERVAL, coalesce_frames, event_frame, stop_on_disconnect, text_frame
+from thread_pool import ThreadPool
+from uploads import UPLOAD_FLIGHTS, UPLOAD_INDEX, UPLOAD_MAX_BYTES, UploadTooLarge, close_spool, spool_upload
 
 app = FastAPI()
 
@@ -34,32 +51,169 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Async client so streaming runs never block the event loop; pooled transport from http_clients.
+# Built on first use (get_client) so a cold start does not pay for importing the SDK.
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The shared AsyncOpenAI client"""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import AsyncOpenAI
+                client = AsyncOpenAI(
+                    api_key=OPENAI_API_KEY,
+                    http_client=http_clients.async_client("openai"),
+                    timeout=http_clients.http_timeout(),
+                    max_retries=http_clients.HTTP_MAX_RETRIES
+                )
+    return client
 
 # Vector Store ID
 VECTOR_STORE_ID = os.getenv("VECTOR_STORE_ID", "vs_692180726b908191af2f182b14342882")
 
 # Singleton Assistant Storage
-# We will store the Assistant ID in memory or env if possible, 
-# but for a simple restartable service, we can check OpenAI on startup.
+# The assistant ID is cached in memory, and together with a fingerprint of
+# its configuration in ASSISTANT_ID/ASSISTANT_FINGERPRINT or a local state
+# file, so restarts and cold starts can skip the OpenAI list/update calls.
 GLOBAL_ASSISTANT_ID = None
+ASSISTANT_STATE_PATH = os.getenv(
+    "ASSISTANT_STATE_PATH",
+    os.path.join(tempfile.gettempdir(), "lawminded_assistant_state.json")
+)
+_assistant_lock: Optional[asyncio.Lock] = None
+# IDs that came back 404 (deleted, or the key now belongs to another project); never reused
+_missing_assistant_ids = set()
+
+def account_key() -> str:
+    """Hash of the API key, organization, project and base URL the assistant belongs to"""
+    account = [OPENAI_API_KEY, os.getenv("OPENAI_ORG_ID"), os.getenv("OPENAI_PROJECT_ID"), os.getenv("OPENAI_BASE_URL")]
+    return hashlib.sha256(json.dumps(account).encode("utf-8")).hexdigest()[:16]
 
-def get_singleton_assistant() -> str:
+def assistant_fingerprint() -> str:
+    """Hash of everything the assistant is configured with"""
+    config = {
+        "prompt_version": PROMPT_VERSION,
+        "instructions": hashlib.sha256(ASSISTANT_INSTRUCTIONS.encode("utf-8")).hexdigest(),
+        "model": ASSISTANT_MODEL,
+        "tools": TOOLS,
+        "vector_store_id": VECTOR_STORE_ID,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+def load_assistant_state() -> Optional[Dict[str, str]]:
+    try:
+        with open(ASSISTANT_STATE_PATH, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        # State saved for another key or project names an assistant this one cannot see
+        if state.get("assistant_id") and state.get("fingerprint") and state.get("account") == account_key():
+            return state
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_assistant_state(assistant_id: str, fingerprint: str) -> None:
+    try:
+        tmp_path = f"{ASSISTANT_STATE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"assistant_id": assistant_id, "fingerprint": fingerprint,
+                       "prompt_version": PROMPT_VERSION, "account": account_key()}, f)
+        os.replace(tmp_path, ASSISTANT_STATE_PATH)
+    except OSError as e:
+        # Read-only filesystems just lose the fast path
+        print(f"⚠️ Could not save assistant state: {e}")
+
+def forget_assistant(assistant_id: str) -> None:
+    """Drop an assistant that no longer exists so the next request resolves a new one"""
+    global GLOBAL_ASSISTANT_ID
+    print(f"⚠️ Assistant {assistant_id} not found, resolving it again")
+    _missing_assistant_ids.add(assistant_id)
+    if GLOBAL_ASSISTANT_ID == assistant_id:
+        GLOBAL_ASSISTANT_ID = None
+    state = load_assistant_state()
+    if state and state["assistant_id"] == assistant_id:
+        try:
+            os.remove(ASSISTANT_STATE_PATH)
+        except OSError:
+            pass
+
+def is_missing_assistant(error: Exception, assistant_id: str) -> bool:
+    """Whether an API error is a 404 for this assistant (not for the thread or run)"""
+    from openai import NotFoundError
+
+    return isinstance(error, NotFoundError) and assistant_id in str(error)
+
+async def get_singleton_assistant() -> str:
     """
     Get or create the singleton assistant.
     Returns the Assistant ID.
     """
-    global GLOBAL_ASSISTANT_ID
+    global GLOBAL_ASSISTANT_ID, _assistant_lock
     
     if GLOBAL_ASSISTANT_ID:
         return GLOBAL_ASSISTANT_ID
 
+    # Created lazily so it binds to the running event loop
+    if _assistant_lock is None:
+        _assistant_lock = asyncio.Lock()
+    async with _assistant_lock:
+        # Another request may have finished initialization while we waited
+        if GLOBAL_ASSISTANT_ID:
+            return GLOBAL_ASSISTANT_ID
+        GLOBAL_ASSISTANT_ID = await _resolve_assistant()
+        return GLOBAL_ASSISTANT_ID
+
+async def _resolve_assistant() -> str:
+    fingerprint = assistant_fingerprint()
+    metadata = {"prompt_version": PROMPT_VERSION, "config_fingerprint": fingerprint}
+    assistant_config = dict(
+        instructions=ASSISTANT_INSTRUCTIONS,
+        model=ASSISTANT_MODEL,
+        tools=TOOLS,
+        tool_resources={
+            "file_search": {
+                "vector_store_ids": [VECTOR_STORE_ID]
+            }
+        },
+        metadata=metadata
+    )
+
+    # Fast path: a known assistant whose configuration has not changed
+    env_id = os.getenv("ASSISTANT_ID")
+    if env_id in _missing_assistant_ids:
+        env_id = None
+    if env_id and os.getenv("ASSISTANT_FINGERPRINT") == fingerprint:
+        print(f"⚡ Using assistant from environment: {env_id}")
+        return env_id
+    state = load_assistant_state()
+    if state and state["assistant_id"] in _missing_assistant_ids:
+        state = None
+    if state and state["fingerprint"] == fingerprint and (not env_id or env_id == state["assistant_id"]):
+        print(f"⚡ Using cached assistant: {state['assistant_id']}")
+        return state["assistant_id"]
+
+    known_id = env_id or (state["assistant_id"] if state else None)
+    if known_id:
+        # Known assistant, stale configuration: one update, no listing
+        print(f"🔄 Configuration changed, updating assistant {known_id}...")
+        try:
+            updated_assistant = await get_client().beta.assistants.update(assistant_id=known_id, **assistant_config)
+        except Exception as e:
+            if not is_missing_assistant(e, known_id):
+                raise
+            forget_assistant(known_id)
+        else:
+            save_assistant_state(updated_assistant.id, fingerprint)
+            return updated_assistant.id
+
     print("🔎 Checking for existing assistant...")
     
     # List assistants to find if one exists with the correct name
     # Note: Pagination might be needed if you have many assistants, 
     # but usually `limit=20` is enough to find the recent one.
-    my_assistants = client.beta.assistants.list(order="desc", limit=20)
+    my_assistants = await get_client().beta.assistants.list(order="desc", limit=20)
     
     existing_assistant = None
     for assistant in my_assistants.data:
@@ -70,37 +224,58 @@ def get_singleton_assistant() -> str:
     if existing_assistant:
         print(f"✅ Found existing assistant: {existing_assistant.id}")
         
-        # We should update it to ensure it has the latest instructions and tools
+        current = getattr(existing_assistant, "metadata", None) or {}
+        if current.get("config_fingerprint") == fingerprint:
+            print("✅ Assistant configuration is up to date")
+            save_assistant_state(existing_assistant.id, fingerprint)
+            return existing_assistant.id
+
+        # Update it so it has the latest instructions and tools
         print("🔄 Updating assistant instructions and tools...")
-        updated_assistant = client.beta.assistants.update(
+        updated_assistant = await get_client().beta.assistants.update(
             assistant_id=existing_assistant.id,
-            instructions=ASSISTANT_INSTRUCTIONS,
-            model=ASSISTANT_MODEL,
-            tools=TOOLS,
-            tool_resources={
-                "file_search": {
-                    "vector_store_ids": [VECTOR_STORE_ID]
-                }
-            }
+            **assistant_config
         )
-        GLOBAL_ASSISTANT_ID = updated_assistant.id
-        return GLOBAL_ASSISTANT_ID
+        save_assistant_state(updated_assistant.id, fingerprint)
+        return updated_assistant.id
     else:
         print("🆕 Creating NEW assistant...")
-        new_assistant = client.beta.assistants.create(
+        new_assistant = await get_client().beta.assistants.create(
             name=ASSISTANT_NAME,
-            instructions=ASSISTANT_INSTRUCTIONS,
-            model=ASSISTANT_MODEL,
-            tools=TOOLS,
-            tool_resources={
-                "file_search": {
-                    "vector_store_ids": [VECTOR_STORE_ID]
-                }
-            }
+            **assistant_config
         )
         print(f"✅ Created assistant: {new_assistant.id}")
-        GLOBAL_ASSISTANT_ID = new_assistant.id
-        return GLOBAL_ASSISTANT_ID
+        save_assistant_state(new_assistant.id, fingerprint)
+        return new_assistant.id
+
+# Pre-created threads for new conversations (get_client follows `client` if it is replaced)
+THREAD_POOL = ThreadPool(get_client)
+# Messages already fetched per thread, for the history endpoint
+THREAD_HISTORY = ThreadHistory(get_client)
+# Rolling notes of turns that fell out of the truncation window (CONTEXT_SUMMARY)
+CONTEXT_SUMMARIES = ContextSummaries(get_client, THREAD_HISTORY)
+# Recent output of every chat stream, for clients reconnecting with Last-Event-ID
+REPLAY_BUFFERS = ReplayBuffers()
+
+# Send a {"type": "timings"} event before [DONE] unless the request says otherwise
+SSE_TIMING_TRAILER = os.getenv("SSE_TIMING_TRAILER", "false").lower() in ("1", "true", "yes")
+
+metrics.register_stats("lawminded_search_cache", "Search result cache", SEARCH_CACHE.stats)
+metrics.register_stats("lawminded_search_coalescing", "Coalesced search requests", SEARCH_FLIGHTS.stats)
+metrics.register_stats("lawminded_thread_pool", "Pre-created thread pool", THREAD_POOL.stats)
+metrics.register_stats("lawminded_upload_index", "Upload dedup index", UPLOAD_INDEX.stats)
+metrics.register_stats("lawminded_answer_cache", "Semantic answer cache", ANSWER_CACHE.stats)
+metrics.register_stats("lawminded_chat_admission", "Chat admission control", CHAT_ADMISSION.stats)
+metrics.register_stats("lawminded_chat_rate_limit", "Per-client chat rate limiting", CHAT_RATE_LIMITER.stats)
+metrics.register_stats("lawminded_thread_history", "Thread message history cache", THREAD_HISTORY.stats)
+metrics.register_stats("lawminded_context_summary", "Rolling context notes", CONTEXT_SUMMARIES.stats)
+metrics.register_stats("lawminded_replay", "Resumable chat stream buffers", REPLAY_BUFFERS.stats)
+metrics.register_stats("lawminded_http", "Outbound HTTP connection pools", http_clients.stats)
+
+# Cached answers are only reused for the same prompt and model
+ANSWER_CACHE_NAMESPACE = f"{PROMPT_VERSION}:{ASSISTANT_MODEL}"
+# Characters per text frame when replaying a cached answer
+ANSWER_REPLAY_CHUNK = 512
 
 class ChatRequest(BaseModel):
     conversation_id: str = None  # Optional, if None, one will be created/returned? Actually usually we want a thread_id
@@ -110,38 +285,262 @@ class ChatRequest(BaseModel):
     thread_id: Optional[str] = None # Prefer thread_id over conversation_id
     message: str
     uploaded_file_ids: Optional[List[str]] = None
+    include_timings: Optional[bool] = None  # Defaults to SSE_TIMING_TRAILER
+    coalesce: Optional[bool] = None  # False: one frame per text delta (SSE_FLUSH_INTERVAL=0 disables it globally)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the singleton assistant on startup"""
+_warm_up_task: Optional[asyncio.Task] = None
+
+async def warm_up() -> None:
+    """Build the OpenAI client, fill the thread pool and resolve the assistant"""
+    started = time.monotonic()
     try:
-        get_singleton_assistant()
+        # The SDK import is the slow part of a cold start; keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, get_client)
+        THREAD_POOL.start()
+        await get_singleton_assistant()
+        print(f"✅ Warm-up finished in {time.monotonic() - started:.2f}s")
     except Exception as e:
         print(f"❌ Failed to initialize assistant: {e}")
 
+@app.on_event("startup")
+async def startup_event():
+    """Start warm-up in the background so /health and / answer right away"""
+    global _warm_up_task
+    _warm_up_task = asyncio.ensure_future(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Delete pooled threads that were never handed out, then close outbound connections"""
+    if _warm_up_task is not None and not _warm_up_task.done():
+        _warm_up_task.cancel()
+    await REPLAY_BUFFERS.aclose()
+    await THREAD_POOL.stop()
+    await http_clients.aclose()
+
+# Allowance for multipart boundaries and headers on top of the file itself
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+class RejectOversizedUploads:
+    """
+    Refuse uploads whose declared size is already over the limit, before the body is read.
+    Plain ASGI, so every other request (chat streams included) goes straight to the app.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/api/upload":
+            content_length = dict(scope["headers"]).get(b"content-length", b"").decode("latin-1")
+            if content_length.isdigit() and int(content_length) > UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"File exceeds the {UPLOAD_MAX_BYTES // (1024 * 1024)} MB upload limit"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(RejectOversizedUploads)
+
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload file to OpenAI and return file ID"""
+async def upload_file(file: UploadFile = File(...), extract: Optional[bool] = None):
+    """
+    Upload file to OpenAI and return file ID.
+    With ?extract=true (or INGEST_LOCAL=true) PDFs are also extracted locally
+    and the response includes page and chunk metadata.
+    """
+    print(f"Uploading file: {file.filename}")
+    started = time.monotonic()
     try:
-        print(f"Uploading file: {file.filename}")
-        content = await file.read()
-        openai_file = client.files.create(
-            file=(file.filename, content),
-            purpose='assistants'
-        )
-        return {
-            "file_id": openai_file.id,
+        with UPLOAD_PHASE.time(phase="spool"):
+            spool, digest, size = await spool_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    UPLOAD_BYTES.observe(size)
+
+    # Whoever finishes last closes the spool: this request or the upload flight it leads,
+    # which keeps streaming from the spool if this request is cancelled mid-upload
+    spool_users = 1
+
+    def release_spool():
+        nonlocal spool_users
+        spool_users -= 1
+        if spool_users == 0:
+            close_spool(spool)
+
+    ingestion = None
+    try:
+        head = spool.read(5)
+        spool.seek(0)
+        if (INGEST_LOCAL_DEFAULT if extract is None else extract) and is_pdf(head, file.filename):
+            # Small uploads live in memory, larger ones on disk where the worker can open them
+            source = spool.getvalue() if isinstance(spool, io.BytesIO) else spool.name
+            ingestion = asyncio.ensure_future(ingest_document(get_executor(), digest, source, file.filename))
+
+        existing = UPLOAD_INDEX.get(digest)
+        if existing:
+            print(f"♻️ Duplicate upload, reusing {existing['file_id']}")
+            file_id = existing["file_id"]
+            status = "duplicate"
+        else:
+            async def upload_spool():
+                try:
+                    # Streamed from the spool by the HTTP client, never fully in memory
+                    with UPLOAD_PHASE.time(phase="openai_upload"):
+                        openai_file = await get_client().files.create(
+                            file=(file.filename, spool),
+                            purpose='assistants'
+                        )
+                    UPLOAD_INDEX.set(digest, {"file_id": openai_file.id, "filename": file.filename, "bytes": size})
+                    return openai_file.id
+                finally:
+                    release_spool()
+
+            def upload_once():
+                # Only called when this request leads the flight
+                nonlocal spool_users
+                spool_users += 1
+                return upload_spool()
+
+            file_id = await UPLOAD_FLIGHTS.do_async(digest, upload_once)
+            status = "uploaded"
+
+        response = {
+            "file_id": file_id,
             "filename": file.filename,
-            "status": "uploaded"
+            "status": status
         }
+        if ingestion is not None:
+            with UPLOAD_PHASE.time(phase="extract_wait"):
+                document = await ingestion
+            if document["status"] == "extracted":
+                link_file_id(file_id, digest)
+            response["document"] = document
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ingestion is not None and not ingestion.done():
+            ingestion.cancel()
+        release_spool()
+        UPLOAD_PHASE.observe(time.monotonic() - started, phase="total")
+
+def track_run_step(event, timings: RunTimings, step_started: Dict[str, float]) -> None:
+    """Time server-side run steps (file_search, function calls, message creation)"""
+    step = event.data
+    if event.event == 'thread.run.step.created':
+        step_started[step.id] = time.monotonic()
+    elif event.event in ('thread.run.step.completed', 'thread.run.step.failed') and step.id in step_started:
+        kind = step.step_details.type
+        if kind == 'tool_calls' and step.step_details.tool_calls:
+            kind = step.step_details.tool_calls[0].type
+        timings.add(f"step_{kind}", time.monotonic() - step_started.pop(step.id))
+
+# Bounds on one chat run: tool rounds (requires_action cycles) and wall time
+RUN_MAX_TOOL_ROUNDS = int(os.getenv("RUN_MAX_TOOL_ROUNDS", "6"))
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "240"))
+
+# Terminal run events other than completion, with the message shown to the user
+RUN_TERMINAL_ERRORS = {
+    'thread.run.failed': "Run failed",
+    'thread.run.expired': "Run expired before it could finish",
+    'thread.run.cancelled': "Run was cancelled",
+}
+
+class RunAborted(Exception):
+    """The run was stopped on our side (deadline or tool round limit)"""
+    def __init__(self, outcome: str, message: str):
+        super().__init__(message)
+        self.outcome = outcome
 
-async def stream_generator(thread_id: str, assistant_id: str, message_content: str, file_ids: List[str] = None):
+def text_frames(event, timings: RunTimings, answer_parts: Optional[List[str]] = None):
+    """SSE frames for the text parts of a thread.message.delta event"""
+    for content_part in event.data.delta.content or []:
+        if content_part.type == 'text' and content_part.text.value:
+            timings.token()
+            if answer_parts is not None:
+                answer_parts.append(content_part.text.value)
+            yield text_frame(content_part.text.value)
+
+async def events_until(stream, deadline: float):
+    """
+    Iterate a run event stream, raising RunAborted once the run deadline passes.
+    One timer per stream cancels whatever task is waiting for the next event,
+    instead of a wait_for (and its wrapper task) around every token.
+    """
+    iterator = stream.__aiter__()
+    waiter: Optional[asyncio.Task] = None
+    expired = False
+
+    def expire():
+        nonlocal expired
+        expired = True
+        if waiter is not None:
+            waiter.cancel()
+
+    # The generator may be resumed by different tasks (see sse.coalesce_frames), so the
+    # waiter is looked up per event rather than bound once like asyncio.timeout() would
+    timer = asyncio.get_running_loop().call_later(max(deadline - time.monotonic(), 0), expire)
+    try:
+        while not expired:
+            waiter = asyncio.current_task()
+            try:
+                event = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            except asyncio.CancelledError:
+                if not expired:
+                    raise
+                # Our own cancellation: take it back so the task is not left marked as cancelled,
+                # unless someone else (the client leaving) cancelled it as well; that one stands
+                uncancel = getattr(waiter, "uncancel", None)
+                if uncancel is not None and uncancel() > 0:
+                    raise
+                break
+            finally:
+                waiter = None
+            yield event
+        raise RunAborted("deadline", f"Run did not finish within {RUN_DEADLINE:g} seconds")
+    finally:
+        timer.cancel()
+
+async def cancel_run(thread_id: str, run_id: Optional[str]) -> None:
+    """Best-effort cancel so a stuck run does not keep the thread locked"""
+    if run_id is None:
+        return
+    try:
+        await get_client().beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+        print(f"🛑 Cancelled run {run_id}")
+    except Exception as e:
+        print(f"⚠️ Could not cancel run {run_id}: {e}")
+
+async def stream_generator(thread_id: str, assistant_id: str, message_content: str, file_ids: List[str] = None,
+                           timings: Optional[RunTimings] = None, include_timings: bool = False,
+                           on_answer: Optional[Callable[[str], None]] = None):
     """
     Generator that creates a run and streams events.
+
+    The first event names the thread. Each event stream either ends the run (completed, failed, expired,
+    cancelled, incomplete) or stops at requires_action; then the tools run
+    and a new stream continues the same run. Up to RUN_MAX_TOOL_ROUNDS
+    rounds are allowed within RUN_DEADLINE seconds, past either limit the
+    run is cancelled. If the client disconnects and does not come back within
+    SSE_RESUME_GRACE (see replay.py), the generator is cancelled and so are
+    the run and its pending tools.
+    on_answer, if given, receives the full answer text of a completed run.
     """
+    timings = timings or RunTimings()
+    step_started: Dict[str, float] = {}
+    deadline = timings.started_at + RUN_DEADLINE
+    outcome = "completed"
+    run_id = None
+    stage = "setup"  # how far the run got, for disconnect metrics
+    answer_parts: Optional[List[str]] = [] if on_answer is not None else None
     try:
+        # Lets the client keep the thread for follow-ups and /api/threads/{thread_id}/messages
+        yield event_frame('thread', thread_id)
+
         # Create user message
         msg_params = {
             "thread_id": thread_id,
@@ -152,89 +551,217 @@ async def stream_generator(thread_id: str, assistant_id: str, message_content: s
             msg_params["attachments"] = [
                 {"file_id": fid, "tools": [{"type": "file_search"}]} for fid in file_ids
             ]
-        
-        client.beta.threads.messages.create(**msg_params)
+
+        with timings.phase("message_create"):
+            await get_client().beta.threads.messages.create(**msg_params)
 
         # Start streaming run
-        stream = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=assistant_id,
-            stream=True
-        )
-        
-        for event in stream:
-            # handle tool calls and text deltas
-            if event.event == 'thread.message.delta':
-                # This is a text delta
-                data = event.data
-                if data.delta.content:
-                    for content_part in data.delta.content:
-                        if content_part.type == 'text' and content_part.text.value:
-                            # Yield text chunk
-                            yield f"data: {json.dumps({'type': 'text', 'content': content_part.text.value})}\n\n"
-            
-            elif event.event == 'thread.run.requires_action':
-                run_obj = event.data
-                tool_outputs = []
-                
-                print("⚡ Processing Tool Calls...")
-                yield f"data: {json.dumps({'type': 'status', 'content': 'Processing tool calls...'})}\n\n"
-
-                for tool_call in run_obj.required_action.submit_tool_outputs.tool_calls:
-                    function_name = tool_call.function.name
-                    args = json.loads(tool_call.function.arguments)
-                    
-                    print(f"   Calling: {function_name} with {args}")
-                    
-                    output = None
-                    if function_name == "search_web":
-                        output = str(search_web_restricted(args.get("query")))
-                    elif function_name == "classify_risk":
-                        output = json.dumps(classify_risk(args.get("system_description"), args.get("features")))
-                    else:
-                        output = "Unknown tool"
-                    
-                    tool_outputs.append({
-                        "tool_call_id": tool_call.id,
-                        "output": output
-                    })
-                
-                # Submit outputs and continue streaming
-                if tool_outputs:
-                    # We need to submit and get a NEW stream
-                    with client.beta.threads.runs.submit_tool_outputs_stream(
-                        thread_id=thread_id,
-                        run_id=run_obj.id,
-                        tool_outputs=tool_outputs
-                    ) as tool_stream:
-                        for tool_event in tool_stream:
-                            if tool_event.event == 'thread.message.delta':
-                                data = tool_event.data
-                                if data.delta.content:
-                                    for content_part in data.delta.content:
-                                        if content_part.type == 'text' and content_part.text.value:
-                                            yield f"data: {json.dumps({'type': 'text', 'content': content_part.text.value})}\n\n"
-                            elif tool_event.event == 'thread.run.completed':
-                                # Done
-                                pass
-
-            elif event.event == 'thread.run.completed':
-                # Run finished
-                pass
-            
-            elif event.event == 'thread.run.failed':
-                print(f"Run failed: {event.data}")
-                yield f"data: {json.dumps({'type': 'error', 'content': 'Run failed'})}\n\n"
+        # Last-N truncation, token budgets, the rolling note of older turns and the IDs of
+        # attached files classify_risk can read (not ingested locally: file_search only)
+        options = run_options(CONTEXT_SUMMARIES.note(thread_id), await readable_file_ids(file_ids))
+        with timings.phase("run_start"):
+            try:
+                stream = await get_client().beta.threads.runs.create(
+                    thread_id=thread_id, assistant_id=assistant_id, stream=True, **options
+                )
+            except Exception as e:
+                if not is_missing_assistant(e, assistant_id):
+                    raise
+                # Deleted assistant, or the key now points at another project: resolve it again once
+                forget_assistant(assistant_id)
+                assistant_id = await get_singleton_assistant()
+                stream = await get_client().beta.threads.runs.create(
+                    thread_id=thread_id, assistant_id=assistant_id, stream=True, **options
+                )
+        stage = "model"
+
+        tool_rounds = 0
+        while stream is not None:
+            next_stream = None
+            opened_at = time.monotonic()
+            async with stream as events:
+                if tool_rounds:
+                    # Entering the submit stream is what sends the tool outputs
+                    timings.add("tool_submit", time.monotonic() - opened_at)
+                async for event in events_until(events, deadline):
+                    if event.event == 'thread.message.delta':
+                        stage = "streaming"
+                        for frame in text_frames(event, timings, answer_parts):
+                            yield frame
+
+                    elif event.event.startswith('thread.run.step.'):
+                        track_run_step(event, timings, step_started)
+
+                    elif event.event == 'thread.run.created':
+                        run_id = event.data.id
+
+                    elif event.event == 'thread.run.requires_action':
+                        run_obj = event.data
+                        run_id = run_obj.id
+                        tool_rounds += 1
+                        if tool_rounds > RUN_MAX_TOOL_ROUNDS:
+                            raise RunAborted("max_tool_rounds", f"Run needed more than {RUN_MAX_TOOL_ROUNDS} tool rounds")
+
+                        print(f"⚡ Processing Tool Calls (round {tool_rounds})...")
+                        yield event_frame('status', 'Processing tool calls...')
+
+                        stage = "tool_calls"
+                        try:
+                            with timings.phase("tool_calls"):
+                                tool_outputs = await asyncio.wait_for(
+                                    dispatch_tool_calls(
+                                        run_obj.required_action.submit_tool_outputs.tool_calls,
+                                        timings=timings
+                                    ),
+                                    timeout=max(deadline - time.monotonic(), 0.001)
+                                )
+                        except asyncio.TimeoutError:
+                            raise RunAborted("deadline", f"Run did not finish within {RUN_DEADLINE:g} seconds")
+                        stage = "model"
+
+                        # The run stays paused until outputs are submitted; a new stream continues it
+                        next_stream = get_client().beta.threads.runs.submit_tool_outputs_stream(
+                            thread_id=thread_id,
+                            run_id=run_id,
+                            tool_outputs=tool_outputs
+                        )
+                        break
+
+                    elif event.event in RUN_TERMINAL_ERRORS:
+                        # Pass failures through right away instead of waiting for the stream to close
+                        timings.record_usage(getattr(event.data, "usage", None))
+                        outcome = event.event.rsplit('.', 1)[-1]
+                        message = RUN_TERMINAL_ERRORS[event.event]
+                        last_error = getattr(event.data, "last_error", None)
+                        if last_error is not None and getattr(last_error, "message", None):
+                            message = f"{message}: {last_error.message}"
+                        print(f"Run {outcome}: {last_error or event.data}")
+                        yield event_frame('error', message)
+                        break
 
+                    elif event.event == 'thread.run.incomplete':
+                        timings.record_usage(getattr(event.data, "usage", None))
+                        outcome = "incomplete"
+                        details = getattr(event.data, "incomplete_details", None)
+                        reason = getattr(details, "reason", None) or "unknown reason"
+                        yield event_frame('status', f'Response was cut short ({reason})')
+                        break
+
+                    elif event.event == 'thread.run.completed':
+                        # Run finished
+                        timings.record_usage(getattr(event.data, "usage", None))
+                        break
+            stream = next_stream
+
+        if timings.usage:
+            print(f"📊 Run usage: {timings.usage['prompt_tokens']} prompt + "
+                  f"{timings.usage['completion_tokens']} completion tokens")
+        if on_answer is not None and outcome == "completed":
+            on_answer("".join(answer_parts))
+        if CONTEXT_SUMMARY_ENABLED and outcome == "completed":
+            CONTEXT_SUMMARIES.schedule(thread_id)
+        summary = timings.finish(outcome)
+        if include_timings:
+            yield event_frame('timings', summary)
+        yield "data: [DONE]\n\n"
+
+    except (asyncio.CancelledError, GeneratorExit):
+        # Client disconnected: stop paying for tokens and tool calls nobody will read
+        print(f"🔌 Client disconnected during {stage}, cancelling run")
+        await cancel_run(thread_id, run_id)
+        timings.abandon(stage)
+        raise
+
+    except Exception as e:
+        if isinstance(e, RunAborted):
+            print(f"🛑 {e}")
+            outcome = e.outcome
+        else:
+            print(f"Stream error: {e}")
+            traceback.print_exc()
+            outcome = "error"
+        # Don't leave the run holding the thread for the next message
+        await cancel_run(thread_id, run_id)
+        timings.finish(outcome)
+        yield event_frame('error', str(e))
+        # Still a complete stream: the client must not take it for a dropped connection and resume
         yield "data: [DONE]\n\n"
 
+async def replay_cached_answer(entry: dict, similarity: float, timings: RunTimings, include_timings: bool = False):
+    """Stream a cached answer with the same framing as a live run"""
+    yield event_frame('cache', {'similarity': round(similarity, 3), 'age': int(time.time() - entry['created_at'])})
+    answer = entry["answer"]
+    for start in range(0, len(answer), ANSWER_REPLAY_CHUNK):
+        timings.token()
+        yield text_frame(answer[start:start + ANSWER_REPLAY_CHUNK])
+    summary = timings.finish("cached")
+    if include_timings:
+        yield event_frame('timings', summary)
+    yield "data: [DONE]\n\n"
+
+def busy_response(rejected: AdmissionRejected) -> JSONResponse:
+    """429 with Retry-After for requests turned away by admission control"""
+    CHAT_REJECTED.inc(reason=rejected.reason)
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, please retry later", "reason": rejected.reason,
+                 "retry_after": rejected.retry_after},
+        headers={"Retry-After": str(rejected.retry_after)}
+    )
+
+async def prepare_run(request: ChatRequest, timings: RunTimings):
+    """(thread_id, assistant_id) for a chat request"""
+    if request.thread_id:
+        with timings.phase("setup"):
+            return request.thread_id, await get_singleton_assistant()
+    # New thread from the pre-warmed pool, resolved alongside the assistant
+    with timings.phase("setup"):
+        thread_id, assistant_id = await asyncio.gather(
+            THREAD_POOL.acquire(),
+            get_singleton_assistant()
+        )
+    print(f"🆕 Using new thread: {thread_id}")
+    return thread_id, assistant_id
+
+async def queued_run(ticket: Ticket, request: ChatRequest, timings: RunTimings, **stream_kwargs):
+    """Report the queue position until a run slot frees up, then stream the run"""
+    stage = "queued"
+    try:
+        async for position in CHAT_ADMISSION.wait(ticket):
+            yield event_frame('queue', {'position': position})
+        timings.add("queue", time.monotonic() - ticket.enqueued_at)
+        stage = "setup"
+        thread_id, assistant_id = await prepare_run(request, timings)
+    except AdmissionRejected as e:
+        CHAT_REJECTED.inc(reason=e.reason)
+        # Too late for a 429: the response has started, so the retry hint travels in the event
+        yield event_frame('error', f"Server is busy, please retry in {e.retry_after} seconds",
+                          reason=e.reason, retry_after=e.retry_after)
+        yield "data: [DONE]\n\n"
+        return
+    except (asyncio.CancelledError, GeneratorExit):
+        print(f"🔌 Client disconnected while {stage}")
+        timings.abandon(stage)
+        raise
     except Exception as e:
         print(f"Stream error: {e}")
-        traceback.print_exc()
-        yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+        yield event_frame('error', str(e))
+        yield "data: [DONE]\n\n"
+        return
+    async for frame in stream_generator(thread_id, assistant_id, request.message, request.uploaded_file_ids,
+                                        timings=timings, **stream_kwargs):
+        yield frame
+
+async def release_when_done(frames, ticket: Ticket):
+    """Pass frames through and free the run slot when the stream ends or the client goes away"""
+    try:
+        async for frame in frames:
+            yield frame
+    finally:
+        CHAT_ADMISSION.release(ticket)
 
 @app.post("/api/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
     """
     Stream chat response.
     """
@@ -266,28 +793,177 @@ async def chat_stream(request: ChatRequest):
     #    Realistically, let's just create a NEW thread if we don't have one 
     #    and return it to the client.
     
-    target_thread_id = request.thread_id
-    if not target_thread_id:
-        # Create new thread
-        t = client.beta.threads.create()
-        target_thread_id = t.id
-        print(f"🆕 Created new thread: {target_thread_id}")
-
-    assistant_id = get_singleton_assistant()
-    
-    return StreamingResponse(
-        stream_generator(
+    # A reconnecting client (Last-Event-ID) re-attaches to its run instead of starting another
+    last_event = parse_event_id(http_request.headers.get("last-event-id"))
+    if last_event is not None:
+        return resume_response(last_event[0], last_event[1], http_request)
+
+    try:
+        CHAT_RATE_LIMITER.check(client_key(http_request))
+    except AdmissionRejected as e:
+        return busy_response(e)
+
+    timings = RunTimings()
+    include_timings = SSE_TIMING_TRAILER if request.include_timings is None else request.include_timings
+
+    # First-turn questions without attachments can be answered from the answer cache
+    on_answer = None
+    if ANSWER_CACHE_ENABLED and not request.thread_id and not request.uploaded_file_ids:
+        cached = ANSWER_CACHE.lookup(request.message, ANSWER_CACHE_NAMESPACE)
+        if cached is not None:
+            entry, similarity = cached
+            print(f"⚡ Answer cache hit ({similarity:.2f}): {entry['question']}")
+            return sse_response(
+                REPLAY_BUFFERS.start(replay_cached_answer(entry, similarity, timings, include_timings)).read(),
+                http_request
+            )
+        question = request.message
+        on_answer = lambda answer: ANSWER_CACHE.store(question, answer, ANSWER_CACHE_NAMESPACE)
+
+    # Cap concurrent runs; over the cap, wait in a bounded queue or get a 429
+    try:
+        ticket = CHAT_ADMISSION.enter()
+    except AdmissionRejected as e:
+        return busy_response(e)
+
+    if ticket.admitted:
+        try:
+            target_thread_id, assistant_id = await prepare_run(request, timings)
+        except BaseException:
+            CHAT_ADMISSION.release(ticket)
+            raise
+        frames = stream_generator(
             thread_id=target_thread_id,
             assistant_id=assistant_id,
             message_content=request.message,
-            file_ids=request.uploaded_file_ids
-        ),
-        media_type="text/event-stream"
-    )
+            file_ids=request.uploaded_file_ids,
+            timings=timings,
+            include_timings=include_timings,
+            on_answer=on_answer
+        )
+    else:
+        print(f"⏳ Chat queued at position {CHAT_ADMISSION.position(ticket)}")
+        frames = queued_run(ticket, request, timings, include_timings=include_timings, on_answer=on_answer)
+    # The run lives in its own task feeding a replay buffer; without a client it is cancelled
+    # once SSE_RESUME_GRACE runs out. The slot is released only once it has actually stopped.
+    frames = release_when_done(frames, ticket)
+    if request.coalesce is not False:
+        frames = coalesce_frames(frames, SSE_FLUSH_INTERVAL)
+    return sse_response(REPLAY_BUFFERS.start(frames).read(), http_request)
+
+def sse_response(frames, http_request: Request) -> StreamingResponse:
+    """Stream buffered frames, letting go of the buffer as soon as the client is gone"""
+    frames = stop_on_disconnect(frames, http_request.is_disconnected)
+    return StreamingResponse(frames, media_type="text/event-stream")
+
+def resume_response(stream_id: str, after: int, http_request: Request) -> StreamingResponse:
+    """Frames of an earlier chat stream after event `after`, then the rest of its run live"""
+    try:
+        frames = REPLAY_BUFFERS.resume(stream_id, after)
+    except ResumeError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    print(f"🔁 Resuming stream {stream_id} after event {after}")
+    return sse_response(frames, http_request)
+
+@app.get("/api/chat/stream/{stream_id}")
+async def chat_stream_resume(stream_id: str, http_request: Request, after: int = 0):
+    """
+    Re-attach to a chat stream: the events after Last-Event-ID (or ?after=),
+    then the rest of the run live. No new run is started; 404 once the
+    stream has expired, 410 if the missed events were dropped.
+    """
+    last_event = parse_event_id(http_request.headers.get("last-event-id"))
+    if last_event is not None and last_event[0] == stream_id:
+        after = last_event[1]
+    return resume_response(stream_id, after, http_request)
+
+@app.get("/api/threads/{thread_id}/messages")
+async def thread_messages(thread_id: str, after: Optional[str] = None, limit: int = 50, order: str = "asc"):
+    """
+    Messages of a thread for rebuilding a conversation, `limit` per page.
+    `after` is the ID of the last message of the previous page (next_cursor);
+    order=desc pages backwards from the newest message.
+    """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    limit = max(1, min(limit, 100))
+    from openai import NotFoundError
+
+    try:
+        messages = await THREAD_HISTORY.messages(thread_id)
+    except NotFoundError:
+        THREAD_HISTORY.forget(thread_id)
+        raise HTTPException(status_code=404, detail="Thread not found")
+    if order == "desc":
+        messages = messages[::-1]
+
+    start = 0
+    if after:
+        ids = [m["id"] for m in messages]
+        if after not in ids:
+            raise HTTPException(status_code=400, detail="Unknown cursor")
+        start = ids.index(after) + 1
+    page = messages[start:start + limit]
+    has_more = start + limit < len(messages)
+    return {
+        "thread_id": thread_id,
+        "messages": page,
+        "has_more": has_more,
+        "next_cursor": page[-1]["id"] if page and has_more else None
+    }
+
+# Request bodies above this size are spooled to disk while a batch is classified
+BATCH_SPOOL_MEMORY = int(os.getenv("BATCH_SPOOL_MEMORY", str(4 * 1024 * 1024)))
+
+async def batch_output(spool, fmt: str):
+    """Stream NDJSON classifications for a spooled batch body, then release it"""
+    try:
+        lines = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        async for line in classify_stream_async(iter_records(lines, fmt), get_executor()):
+            yield line
+    finally:
+        spool.close()
+
+@app.post("/api/classify/batch")
+async def classify_batch(request: Request, format: Optional[str] = None):
+    """
+    Classify an inventory of AI systems without the LLM.
+    Body: JSONL or CSV (id, system_description, features). Format comes from
+    ?format=csv|jsonl or the Content-Type. Results stream back as NDJSON.
+    """
+    fmt = format or detect_format(content_type=request.headers.get("content-type"))
+    if fmt not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'jsonl'")
+
+    # Read the whole body first: the response stream must not compete
+    # with the body for ASGI receive() messages.
+    spool = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_MEMORY)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    return StreamingResponse(batch_output(spool, fmt), media_type="application/x-ndjson")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "assistant_id": GLOBAL_ASSISTANT_ID}
+    return {
+        "status": "healthy",
+        "assistant_id": GLOBAL_ASSISTANT_ID,
+        "search_cache": SEARCH_CACHE.stats(),
+        "search_coalescing": SEARCH_FLIGHTS.stats(),
+        "thread_pool": THREAD_POOL.stats(),
+        "answer_cache": ANSWER_CACHE.stats(),
+        "admission": CHAT_ADMISSION.stats(),
+        "thread_history": THREAD_HISTORY.stats(),
+        "context_summary": CONTEXT_SUMMARIES.stats(),
+        "replay": REPLAY_BUFFERS.stats(),
+        "http": http_clients.stats()
+    }
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of latency histograms and component stats"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def root():
@@ -0,0 +1,265 @@
+"""
+Minimal Prometheus-style metrics.
+
+Histograms and counters with labels, plus stats callbacks for components
+that already keep their own counters (caches, pools). render() produces
+the Prometheus text exposition format served on /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+RATE_BUCKETS = (1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+SIZE_BUCKETS = (1e4, 1e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8)
+TOKEN_BUCKETS = (500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+_registry: List["_Metric"] = []
+_stats_sources: List[Tuple[str, str, Callable[[], dict]]] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', repr(float(bound))))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def register_stats(prefix: str, documentation: str, source: Callable[[], dict]) -> None:
+    """Export the numeric fields of a stats() dict as gauges named <prefix>_<field>"""
+    _stats_sources.append((prefix, documentation, source))
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for prefix, documentation, source in _stats_sources:
+        try:
+            stats = source()
+        except Exception as e:
+            lines.append(f"# {prefix} unavailable: {e}")
+            continue
+        for field, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{prefix}_{field}"
+            lines.append(f"# HELP {name} {documentation} ({field})")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Metrics shared across modules ---
+
+CHAT_TTFT = Histogram("lawminded_chat_ttft_seconds", "Time from chat request to first streamed text token")
+CHAT_PHASE = Histogram("lawminded_chat_phase_seconds", "Duration of each phase of a chat run", ("phase",))
+CHAT_RUN = Histogram("lawminded_chat_run_seconds", "Total duration of a chat run", ("outcome",))
+CHAT_TOKENS_PER_SECOND = Histogram(
+    "lawminded_chat_tokens_per_second", "Streaming rate of text deltas after the first token", buckets=RATE_BUCKETS
+)
+CHAT_USAGE_TOKENS = Counter("lawminded_chat_usage_tokens_total", "Tokens billed for chat runs", ("kind",))
+CHAT_PROMPT_TOKENS = Histogram(
+    "lawminded_chat_prompt_tokens", "Prompt tokens per chat run (all tool rounds)", buckets=TOKEN_BUCKETS
+)
+CHAT_REJECTED = Counter("lawminded_chat_rejected_total", "Chat requests turned away by admission control", ("reason",))
+CHAT_DISCONNECTS = Counter(
+    "lawminded_chat_disconnects_total", "Chat streams abandoned by the client, by the stage they reached", ("stage",)
+)
+CHAT_SAVED_SECONDS = Counter(
+    "lawminded_chat_cancel_saved_seconds_total", "Estimated run time saved by cancelling runs of disconnected clients"
+)
+CHAT_SAVED_DELTAS = Counter(
+    "lawminded_chat_cancel_saved_text_deltas_total", "Estimated text deltas not generated thanks to cancelled runs"
+)
+TOOL_LATENCY = Histogram("lawminded_tool_seconds", "Tool call latency", ("tool", "outcome"))
+SEARCH_LATENCY = Histogram("lawminded_search_seconds", "search_web_restricted latency", ("source",))
+UPLOAD_PHASE = Histogram("lawminded_upload_phase_seconds", "Duration of each upload phase", ("phase",))
+UPLOAD_BYTES = Histogram("lawminded_upload_bytes", "Size of uploaded files", buckets=SIZE_BUCKETS)
+
+
+class RunAverage:
+    """Moving average of completed runs, the baseline for estimating work saved by cancellation"""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.seconds: Optional[float] = None
+        self.text_deltas: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, seconds: float, text_deltas: int) -> None:
+        with self._lock:
+            if self.seconds is None:
+                self.seconds, self.text_deltas = seconds, float(text_deltas)
+                return
+            self.seconds += self.alpha * (seconds - self.seconds)
+            self.text_deltas += self.alpha * (text_deltas - self.text_deltas)
+
+
+COMPLETED_RUNS = RunAverage()
+
+
+class RunTimings:
+    """Per-request phase timer for a chat stream, feeding the chat histograms"""
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.phases: Dict[str, float] = {}
+        self.tools: List[dict] = []  # filled by tools.dispatch_tool_calls
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.tokens = 0
+        self.usage: Optional[Dict[str, int]] = None
+
+    def add(self, name: str, elapsed: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+        CHAT_PHASE.observe(elapsed, phase=name)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def token(self, count: int = 1) -> None:
+        now = time.monotonic()
+        if self.first_token_at is None:
+            self.first_token_at = now
+            CHAT_TTFT.observe(now - self.started_at)
+        self.last_token_at = now
+        self.tokens += count
+
+    def record_usage(self, usage) -> None:
+        """Token usage reported by the API for the run (cumulative over its tool rounds)"""
+        if usage is None:
+            return
+        self.usage = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+            "total_tokens": usage.total_tokens or 0,
+        }
+        CHAT_USAGE_TOKENS.inc(self.usage["prompt_tokens"], kind="prompt")
+        CHAT_USAGE_TOKENS.inc(self.usage["completion_tokens"], kind="completion")
+        CHAT_PROMPT_TOKENS.observe(self.usage["prompt_tokens"])
+
+    def finish(self, outcome: str = "completed") -> dict:
+        """Record run totals and return a summary (seconds, rounded to ms)"""
+        total = time.monotonic() - self.started_at
+        CHAT_RUN.observe(total, outcome=outcome)
+        if outcome == "completed":
+            COMPLETED_RUNS.update(total, self.tokens)
+        summary = {
+            "total": round(total, 3),
+            "ttft": round(self.first_token_at - self.started_at, 3) if self.first_token_at else None,
+            "phases": {k: round(v, 3) for k, v in self.phases.items()},
+            "text_deltas": self.tokens,
+        }
+        if self.tools:
+            summary["tools"] = self.tools
+        if self.usage:
+            summary["usage"] = self.usage
+        if self.first_token_at and self.last_token_at and self.last_token_at > self.first_token_at:
+            rate = self.tokens / (self.last_token_at - self.first_token_at)
+            CHAT_TOKENS_PER_SECOND.observe(rate)
+            summary["tokens_per_second"] = round(rate, 1)
+        return summary
+
+    def abandon(self, stage: str) -> dict:
+        """Finish a run cut short by a client disconnect, counting the work it no longer costs"""
+        CHAT_DISCONNECTS.inc(stage=stage)
+        if COMPLETED_RUNS.seconds is not None:
+            CHAT_SAVED_SECONDS.inc(max(COMPLETED_RUNS.seconds - (time.monotonic() - self.started_at), 0.0))
+            CHAT_SAVED_DELTAS.inc(max(COMPLETED_RUNS.text_deltas - self.tokens, 0.0))
+        return self.finish("client_disconnect")
@@ -154,3 +154,27 @@ Your Process:
 # --- ASSISTANT CONFIGURATION ---
 ASSISTANT_NAME = "LawMinded - EU AI Act Expert"
 ASSISTANT_MODEL = "gpt-4o"  # Use latest GPT-4o model
+
+# --- CONTEXT SUMMARY (rolling note for turns outside the truncation window) ---
+CONTEXT_SUMMARY_INSTRUCTIONS = """
+You maintain a compact running note of an EU AI Act compliance conversation.
+You get the current note (possibly empty) and the conversation turns that have
+just dropped out of the assistant's context window. Return the updated note.
+
+Keep: the user's AI systems and their descriptions, risk classifications given,
+article numbers cited, uploaded document names, decisions, open questions and
+deadlines. Drop greetings, repetition and wording details. Plain bullet points,
+no preamble, at most {max_chars} characters.
+""".strip()
+
+# Prepended to the run as additional_instructions when a note exists
+CONTEXT_NOTE_TEMPLATE = """
+Summary of earlier turns of this conversation that are no longer shown to you:
+{note}
+""".strip()
+
+# Added to the run's additional_instructions when the new message has attachments
+ATTACHED_FILES_TEMPLATE = """
+Files attached to the user's latest message: {file_ids}.
+When classifying a system described in one of them, pass its ID as file_id to classify_risk.
+""".strip()
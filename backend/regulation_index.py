@@ -0,0 +1,339 @@
+"""
+Local full-text index of the regulation corpus (SQLite FTS5, BM25 ranking).
+
+A snapshot of the documents behind ALLOWED_SEARCH_DOMAINS (the AI Act
+text, service-desk FAQs, ...) is split into passages at Article/Annex
+headings and indexed once. search_web queries this index first and only
+goes to Tavily when the best passage misses too much of the query
+(IDF-weighted coverage below REGULATION_INDEX_MIN_SCORE), so most
+searches take milliseconds and work offline.
+
+Corpus layout: a directory of .txt/.md/.html/.pdf files plus an optional
+manifest.json mapping file names to {"url": ..., "title": ...}.
+
+CLI usage (from backend/):
+    python regulation_index.py fetch corpus/            # download manifest URLs not yet on disk
+    python regulation_index.py build corpus/            # (re)index new and changed files only
+    python regulation_index.py search "transparency obligations chatbots"
+    python regulation_index.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional, Tuple
+
+REGULATION_INDEX_PATH = os.getenv(
+    "REGULATION_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "regulation_index.sqlite3")
+)
+# Share of the query (IDF-weighted terms, 0-1) the best passage must contain,
+# otherwise search_web falls back to Tavily
+REGULATION_INDEX_MIN_SCORE = float(os.getenv("REGULATION_INDEX_MIN_SCORE", "0.7"))
+REGULATION_PASSAGE_CHARS = int(os.getenv("REGULATION_PASSAGE_CHARS", "1500"))
+
+CORPUS_EXTENSIONS = (".txt", ".md", ".html", ".htm", ".pdf")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    url TEXT,
+    title TEXT,
+    passages INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(
+    title, body, path UNINDEXED, url UNINDEXED, tokenize = 'porter unicode61'
+);
+"""
+
+_HEADING = re.compile(r"^(article\s+\d+[a-z]?|annex\s+[ivxlc]+|recital\s+\(?\d+\)?|chapter\s+[ivxlc]+|section\s+\d+)\b",
+                      re.IGNORECASE)
+_BLANK_LINES = re.compile(r"\n\s*\n")
+_TERM = re.compile(r"\w+")
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it of on or that the this to
+under what when which who why with
+""".split())
+
+
+class _TextExtractor(HTMLParser):
+    """Visible text of an HTML page, one block element per paragraph"""
+    _BLOCKS = {"p", "div", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "br", "section", "article", "table"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "nav", "header", "footer"):
+            self._skip += 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "nav", "header", "footer") and self._skip:
+            self._skip -= 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def read_document(path: str) -> str:
+    """Plain text of a corpus file"""
+    if path.endswith(".pdf"):
+        from ingest import extract_pdf
+        return extract_pdf(path)["text"]
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if path.endswith((".html", ".htm")):
+        parser = _TextExtractor()
+        parser.feed(text)
+        text = "".join(parser.parts)
+    return text
+
+
+def split_passages(text: str, max_chars: int = REGULATION_PASSAGE_CHARS) -> Iterator[Tuple[Optional[str], str]]:
+    """(heading, passage) pairs: a new passage starts at each Article/Annex heading or after max_chars"""
+    heading = None
+    current: List[str] = []
+    size = 0
+    for paragraph in _BLANK_LINES.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if _HEADING.match(paragraph):
+            if current:
+                yield heading, "\n".join(current)
+            heading, current, size = paragraph[:120], [], 0
+        elif current and size + len(paragraph) > max_chars:
+            yield heading, "\n".join(current)
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph)
+    if current:
+        yield heading, "\n".join(current)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _load_manifest(corpus_dir: str) -> Dict[str, dict]:
+    path = os.path.join(corpus_dir, "manifest.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_index(corpus_dir: str, index_path: str = REGULATION_INDEX_PATH,
+                max_chars: int = REGULATION_PASSAGE_CHARS) -> Dict[str, int]:
+    """Index new and changed corpus files, drop removed ones. Returns counts per action."""
+    manifest = _load_manifest(corpus_dir)
+    conn = sqlite3.connect(index_path)
+    conn.executescript(_SCHEMA)
+    known = dict(conn.execute("SELECT path, sha256 FROM documents"))
+    counts = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "passages": 0}
+
+    seen = set()
+    for root, _, files in os.walk(corpus_dir):
+        for name in sorted(files):
+            if not name.lower().endswith(CORPUS_EXTENSIONS):
+                continue
+            full_path = os.path.join(root, name)
+            rel_path = os.path.relpath(full_path, corpus_dir)
+            seen.add(rel_path)
+            sha = _file_sha256(full_path)
+            if known.get(rel_path) == sha:
+                counts["unchanged"] += 1
+                continue
+
+            meta = manifest.get(rel_path, {})
+            doc_title = meta.get("title") or os.path.splitext(name)[0].replace("_", " ")
+            try:
+                text = read_document(full_path)
+            except Exception as e:
+                print(f"⚠️ Skipping {rel_path}: {e}", file=sys.stderr)
+                continue
+            rows = [
+                (f"{doc_title} - {heading}" if heading else doc_title, body, rel_path, meta.get("url"))
+                for heading, body in split_passages(text, max_chars)
+            ]
+            with conn:
+                conn.execute("DELETE FROM passages WHERE path = ?", (rel_path,))
+                conn.executemany("INSERT INTO passages (title, body, path, url) VALUES (?, ?, ?, ?)", rows)
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (path, sha256, url, title, passages, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (rel_path, sha, meta.get("url"), doc_title, len(rows), time.time())
+                )
+            counts["updated" if rel_path in known else "added"] += 1
+            counts["passages"] += len(rows)
+            print(f"📚 Indexed {rel_path}: {len(rows)} passages", file=sys.stderr)
+
+    for rel_path in set(known) - seen:
+        with conn:
+            conn.execute("DELETE FROM passages WHERE path = ?", (rel_path,))
+            conn.execute("DELETE FROM documents WHERE path = ?", (rel_path,))
+        counts["removed"] += 1
+
+    if counts["added"] or counts["updated"] or counts["removed"]:
+        conn.execute("INSERT INTO passages (passages) VALUES ('optimize')")
+        conn.commit()
+    conn.close()
+    return counts
+
+
+def fetch_corpus(corpus_dir: str, refresh: bool = False, allowed_domains: Optional[List[str]] = None) -> int:
+    """Download manifest URLs that are missing from the corpus (all of them with refresh=True)"""
+    from urllib.parse import urlparse
+
+    import http_clients
+
+    http = http_clients.session("corpus")
+
+    fetched = 0
+    for rel_path, meta in _load_manifest(corpus_dir).items():
+        url = meta.get("url")
+        target = os.path.join(corpus_dir, rel_path)
+        if not url or (os.path.exists(target) and not refresh):
+            continue
+        if allowed_domains and urlparse(url).hostname not in allowed_domains:
+            print(f"⚠️ Skipping {url}: not an allowed domain", file=sys.stderr)
+            continue
+        response = http.get(url, timeout=60)
+        response.raise_for_status()
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(response.content)
+        fetched += 1
+        print(f"⬇️ {url} -> {rel_path}", file=sys.stderr)
+    return fetched
+
+
+class RegulationIndex:
+    """Read-only search over a built index; one SQLite connection per thread"""
+
+    def __init__(self, path: str = REGULATION_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._passages: Optional[int] = None
+        self.searches = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def search(self, query: str, limit: int = 5) -> Tuple[List[dict], float]:
+        """
+        Top passages for a query in Tavily's result shape (BM25 ranked), plus
+        a confidence score: the IDF-weighted share of query terms that the
+        best passage contains. Unlike raw BM25 it does not depend on corpus size.
+        """
+        terms = list(dict.fromkeys(t for t in _TERM.findall((query or "").lower()) if t not in _STOPWORDS and len(t) > 1))
+        if not terms:
+            return [], 0.0
+        self.searches += 1
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT rowid, title, url, body, bm25(passages, 4.0, 1.0) AS score FROM passages "
+            "WHERE passages MATCH ? ORDER BY score LIMIT ?",
+            (" OR ".join(f'"{t}"' for t in terms), limit)
+        ).fetchall()
+        if not rows:
+            return [], 0.0
+        results = [
+            {"title": title, "url": url or "", "content": body, "score": round(-score, 3)}
+            for _, title, url, body, score in rows
+        ]
+
+        if self._passages is None:
+            self._passages = conn.execute("SELECT COALESCE(SUM(passages), 0) FROM documents").fetchone()[0]
+        matched = total = 0.0
+        for term in terms:
+            # Document frequency (with the index's own stemming) and whether the top passage has the term
+            df, in_top = conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(rowid = ?), 0) FROM passages WHERE passages MATCH ?",
+                (rows[0][0], f'"{term}"')
+            ).fetchone()
+            idf = math.log((self._passages + 1) / (df + 0.5))
+            total += idf
+            matched += idf if in_top else 0.0
+        return results, (matched / total if total > 0 else 0.0)
+
+    def stats(self) -> Dict[str, int]:
+        documents, passages = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(passages), 0) FROM documents"
+        ).fetchone()
+        return {"documents": documents, "passages": passages, "searches": self.searches}
+
+
+def open_index(path: str = REGULATION_INDEX_PATH) -> Optional[RegulationIndex]:
+    """The local index, or None when it has not been built"""
+    if not os.path.exists(path):
+        return None
+    return RegulationIndex(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=REGULATION_INDEX_PATH, help="index file (default: REGULATION_INDEX_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch = commands.add_parser("fetch", help="download manifest URLs into the corpus directory")
+    fetch.add_argument("corpus")
+    fetch.add_argument("--refresh", action="store_true", help="download files that already exist too")
+    build = commands.add_parser("build", help="index new and changed corpus files")
+    build.add_argument("corpus")
+    build.add_argument("--passage-chars", type=int, default=REGULATION_PASSAGE_CHARS)
+    search = commands.add_parser("search", help="query the index and show scores")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=5)
+    commands.add_parser("stats", help="show index size")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        from tools import ALLOWED_SEARCH_DOMAINS
+        count = fetch_corpus(args.corpus, args.refresh, ALLOWED_SEARCH_DOMAINS)
+        print(f"✅ Downloaded {count} documents", file=sys.stderr)
+    elif args.command == "build":
+        counts = build_index(args.corpus, args.index, args.passage_chars)
+        print(f"✅ {json.dumps(counts)}", file=sys.stderr)
+    else:
+        index = open_index(args.index)
+        if index is None:
+            sys.exit(f"No index at {args.index}; run the build command first")
+        if args.command == "stats":
+            print(json.dumps(index.stats()))
+            return
+        started = time.perf_counter()
+        results, confidence = index.search(args.query, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        verdict = "local" if confidence >= REGULATION_INDEX_MIN_SCORE else "fallback to Tavily"
+        print(f"confidence={confidence:.2f} (threshold {REGULATION_INDEX_MIN_SCORE}) -> {verdict}, {elapsed:.1f}ms")
+        for r in results:
+            print(f"  {r['score']:7.2f}  {r['title']}  {r['url']}")
+
+
+if __name__ == "__main__":
+    main()
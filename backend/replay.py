@@ -0,0 +1,243 @@
+"""
+Replay buffers for resumable chat streams.
+
+A chat run no longer writes to its HTTP response directly: it runs in a
+task of its own that appends every SSE frame to a StreamBuffer, and the
+response reads the frames back with an `id: <stream_id>:<seq>` line on
+each. A client whose connection drops reconnects with the last ID it saw
+(Last-Event-ID) and gets the frames it missed, then the rest live, from
+the same run instead of asking again and paying for a new one.
+
+When the last reader leaves, the run keeps going for SSE_RESUME_GRACE
+seconds and is cancelled only if nobody re-attaches (0 cancels it right
+away, as before). Finished streams stay replayable for SSE_REPLAY_TTL
+seconds. Each buffer keeps at most SSE_REPLAY_MAX_BYTES of frames (the
+oldest are dropped) and at most SSE_REPLAY_STREAMS streams are kept.
+"""
+
+import asyncio
+import os
+import secrets
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from sse import event_frame
+
+# Seconds a run keeps going with no client attached, waiting for a reconnect
+SSE_RESUME_GRACE = float(os.getenv("SSE_RESUME_GRACE", "15"))
+# Seconds a finished stream can still be replayed
+SSE_REPLAY_TTL = float(os.getenv("SSE_REPLAY_TTL", "120"))
+SSE_REPLAY_MAX_BYTES = int(os.getenv("SSE_REPLAY_MAX_BYTES", str(256 * 1024)))
+SSE_REPLAY_STREAMS = int(os.getenv("SSE_REPLAY_STREAMS", "1000"))
+
+
+class ResumeError(Exception):
+    """A stream that cannot be resumed; status is the HTTP status to answer with"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(stream_id, seq) from an SSE event ID, None if it is not one of ours"""
+    stream_id, _, seq = (value or "").strip().rpartition(":")
+    if not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+class StreamBuffer:
+    """Frames of one chat response, numbered from 1, fed by a producer task"""
+
+    def __init__(self, stream_id: str, max_bytes: int = SSE_REPLAY_MAX_BYTES, grace: float = SSE_RESUME_GRACE):
+        self.id = stream_id
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self.frames: Deque[Tuple[int, str]] = deque()
+        self.bytes = 0
+        self.last_seq = 0
+        self.readers = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.abandoned = False  # cancelled because no client came back
+        self._changed = asyncio.Event()
+        self._producer: Optional[asyncio.Task] = None
+        self._grace_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def first_seq(self) -> int:
+        return self.frames[0][0] if self.frames else self.last_seq + 1
+
+    def can_resume(self, after: int) -> bool:
+        """Whether every frame after `after` is still buffered"""
+        return self.first_seq - 1 <= after <= self.last_seq
+
+    def start(self, frames: AsyncIterator[str]) -> None:
+        self._producer = asyncio.ensure_future(self._produce(frames))
+
+    async def _produce(self, frames: AsyncIterator[str]) -> None:
+        try:
+            async for frame in frames:
+                self._append(frame)
+        except asyncio.CancelledError:
+            # Tell a client that comes back too late why the answer stops here
+            self._append(event_frame('error', "Run was cancelled after the client disconnected"))
+            self._append("data: [DONE]\n\n")
+        except Exception as e:
+            print(f"Stream error: {e}")
+            self._append(event_frame('error', str(e)))
+            self._append("data: [DONE]\n\n")
+        finally:
+            aclose = getattr(frames, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._cancel_grace_timer()
+            self._wake()
+
+    def _append(self, frame: str) -> None:
+        self.last_seq += 1
+        self.frames.append((self.last_seq, frame))
+        self.bytes += len(frame)
+        while self.bytes > self.max_bytes and len(self.frames) > 1:
+            _, dropped = self.frames.popleft()
+            self.bytes -= len(dropped)
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def read(self, after: int = 0) -> AsyncIterator[str]:
+        """Frames after sequence number `after` with their SSE id, then live ones until the stream ends"""
+        self.readers += 1
+        self._cancel_grace_timer()
+        try:
+            while True:
+                changed = self._changed
+                if after + 1 < self.first_seq:
+                    # A reader this far behind already lost frames to the byte cap
+                    yield event_frame('error', "Client fell too far behind the stream")
+                    yield "data: [DONE]\n\n"
+                    return
+                start = after + 1 - self.first_seq
+                pending = list(islice(self.frames, start, None))
+                for seq, frame in pending:
+                    after = seq
+                    yield f"id: {self.id}:{seq}\n{frame}"
+                if pending:
+                    continue
+                if self.done:
+                    return
+                await changed.wait()
+        finally:
+            self.readers -= 1
+            if self.readers == 0 and not self.done:
+                self._on_abandoned()
+
+    def _on_abandoned(self) -> None:
+        if self.grace <= 0:
+            self.cancel()
+        else:
+            print(f"⏸️ Stream {self.id} has no client, keeping the run for {self.grace:g}s")
+            self._grace_timer = asyncio.get_running_loop().call_later(self.grace, self.cancel)
+
+    def _cancel_grace_timer(self) -> None:
+        if self._grace_timer is not None:
+            self._grace_timer.cancel()
+            self._grace_timer = None
+
+    def cancel(self) -> None:
+        """Stop the producer (and so the run) if it is still going"""
+        self._grace_timer = None
+        if self._producer is not None and not self._producer.done():
+            self.abandoned = True
+            self._producer.cancel()
+
+
+class ReplayBuffers:
+    """Stream buffers by ID; finished ones expire after ttl, the oldest finished go first beyond max_streams"""
+
+    def __init__(self, ttl: float = SSE_REPLAY_TTL, max_streams: int = SSE_REPLAY_STREAMS,
+                 max_bytes: int = SSE_REPLAY_MAX_BYTES, grace: float = SSE_RESUME_GRACE):
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self.max_bytes = max_bytes
+        self.grace = grace
+        self._streams: "OrderedDict[str, StreamBuffer]" = OrderedDict()
+        self.started = 0
+        self.resumed = 0
+        self.not_found = 0
+        self.gaps = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.abandoned = 0
+
+    def start(self, frames: AsyncIterator[str]) -> StreamBuffer:
+        """Run `frames` into a new buffer"""
+        self._prune()
+        buffer = StreamBuffer(secrets.token_urlsafe(12), self.max_bytes, self.grace)
+        self._streams[buffer.id] = buffer
+        buffer.start(frames)
+        self.started += 1
+        return buffer
+
+    def resume(self, stream_id: str, after: int) -> AsyncIterator[str]:
+        """Frames of a stream after event `after`; ResumeError if they are gone"""
+        self._prune()
+        buffer = self._streams.get(stream_id)
+        if buffer is None:
+            self.not_found += 1
+            raise ResumeError(404, "Stream not found or expired")
+        if not buffer.can_resume(after):
+            self.gaps += 1
+            raise ResumeError(410, "Missed events are no longer buffered")
+        self.resumed += 1
+        return buffer.read(after)
+
+    def _forget(self, stream_id: str) -> None:
+        buffer = self._streams.pop(stream_id)
+        if buffer.abandoned:
+            self.abandoned += 1
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for stream_id, buffer in list(self._streams.items()):
+            if buffer.done and now - buffer.finished_at > self.ttl:
+                self._forget(stream_id)
+                self.expirations += 1
+        # Live streams are never dropped; admission control already bounds them
+        for stream_id, buffer in list(self._streams.items()):
+            if len(self._streams) <= self.max_streams:
+                break
+            if buffer.done:
+                self._forget(stream_id)
+                self.evictions += 1
+
+    async def aclose(self) -> None:
+        """Cancel every live stream (app shutdown)"""
+        producers = [b._producer for b in self._streams.values() if b._producer is not None and not b.done]
+        for producer in producers:
+            producer.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        buffers = list(self._streams.values())
+        return {
+            "streams": len(buffers),
+            "live": sum(1 for b in buffers if not b.done),
+            "detached": sum(1 for b in buffers if not b.done and b.readers == 0),
+            "bytes": sum(b.bytes for b in buffers),
+            "max_streams": self.max_streams,
+            "started": self.started,
+            "resumed": self.resumed,
+            "not_found": self.not_found,
+            "gaps": self.gaps,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "abandoned": self.abandoned + sum(1 for b in buffers if b.abandoned),
+        }
@@ -0,0 +1,174 @@
+"""
+Rule table and single-pass matcher for classify_risk.
+
+The rule table (risk_rules.json) lists EU AI Act vocabulary per risk tier.
+It is loaded once at import and compiled into a word-level trie, so a
+description is scanned once no matter how many terms the table holds.
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+RISK_RULES_PATH = os.getenv(
+    "RISK_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_rules.json")
+)
+
+_SEPARATORS = re.compile(r"[\s\-]+")
+_WORDS = re.compile(r"\w+")
+
+
+def _term_words(term: str) -> Tuple[List[str], bool]:
+    """Split a rule term into lowercase words; a trailing * marks the last word as a prefix"""
+    is_prefix = term.endswith("*")
+    words = [w for w in _SEPARATORS.split(term.rstrip("*").lower()) if w]
+    return words, is_prefix
+
+
+class _Node:
+    __slots__ = ("children", "term", "stems", "stem_lengths")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.term: Optional[Tuple[str, str]] = None
+        # Prefix terms ending at this node: stem -> (term, tier)
+        self.stems: Dict[str, Tuple[str, str]] = {}
+        self.stem_lengths: Tuple[int, ...] = ()
+
+
+class RiskMatcher:
+    """
+    Compiled matcher over every term of every tier.
+
+    Terms are stored in a word-level trie. The text is tokenized once,
+    positions whose token cannot start a term are skipped, and the rest are
+    extended through the trie, so the cost is one pass over the tokens
+    regardless of how many terms the table holds.
+    Matches are leftmost-longest and non-overlapping, so
+    "emotion recognition in the workplace" wins over "emotion recognition".
+    """
+
+    def __init__(self, rules: dict):
+        self.version = rules.get("version")
+        self.tiers: List[dict] = rules["tiers"]
+        self.default: dict = rules["default"]
+        self._severity = {tier["tier"]: rank for rank, tier in enumerate(self.tiers)}
+
+        self._root = _Node()
+        for tier in self.tiers:
+            for term in tier["terms"]:
+                self._add(term, tier["tier"])
+        self._freeze(self._root)
+
+    def _add(self, term: str, tier: str) -> None:
+        words, is_prefix = _term_words(term)
+        if not words:
+            return
+        node = self._root
+        for word in words[:-1]:
+            node = node.children.setdefault(word, _Node())
+        last = words[-1]
+        # First (most severe) tier wins if a term is listed twice
+        if is_prefix:
+            node.stems.setdefault(last, (term, tier))
+        else:
+            node = node.children.setdefault(last, _Node())
+            if node.term is None:
+                node.term = (term, tier)
+
+    def _freeze(self, node: _Node) -> None:
+        node.stem_lengths = tuple(sorted({len(s) for s in node.stems}, reverse=True))
+        for child in node.children.values():
+            self._freeze(child)
+
+    def _match_at(self, tokens: List[str], start: int) -> Tuple[Optional[Tuple[str, str]], int]:
+        """Longest term starting at tokens[start]; returns (hit, tokens consumed)"""
+        node = self._root
+        best, best_len = None, 0
+        i = start
+        n = len(tokens)
+        while i < n:
+            word = tokens[i]
+            for length in node.stem_lengths:
+                if length <= len(word):
+                    hit = node.stems.get(word[:length])
+                    if hit is not None:
+                        best, best_len = hit, i - start + 1
+                        break
+            node = node.children.get(word)
+            if node is None:
+                break
+            i += 1
+            if node.term is not None:
+                best, best_len = node.term, i - start
+        return best, best_len
+
+    def _starters(self, vocabulary: set) -> set:
+        """Distinct tokens of the text that can start a term"""
+        root = self._root
+        starters = vocabulary & root.children.keys()
+        for word in vocabulary:
+            for length in root.stem_lengths:
+                if length <= len(word) and word[:length] in root.stems:
+                    starters.add(word)
+                    break
+        return starters
+
+    def find_terms(self, text: str) -> List[dict]:
+        """One pass over text; returns each matched term with its tier and count, in order of first occurrence"""
+        tokens = _WORDS.findall(text.lower())
+        # Set operations on the distinct tokens run in C and rule out most
+        # positions before the trie is walked at all.
+        starters = self._starters(set(tokens))
+        if not starters:
+            return []
+
+        found: Dict[str, dict] = {}
+        next_free = 0
+        for i in [i for i, word in enumerate(tokens) if word in starters]:
+            if i < next_free:
+                continue
+            hit, consumed = self._match_at(tokens, i)
+            if hit is None:
+                continue
+            term, tier = hit
+            entry = found.get(term)
+            if entry is None:
+                found[term] = {"term": term, "tier": tier, "count": 1}
+            else:
+                entry["count"] += 1
+            next_free = i + consumed
+        return list(found.values())
+
+    def classify(self, text: str) -> dict:
+        """Risk level of the most severe matched tier, plus every matched term"""
+        matched = self.find_terms(text)
+        if not matched:
+            return {**self.default, "matched_terms": []}
+        top = min(matched, key=lambda m: self._severity[m["tier"]])["tier"]
+        tier = self.tiers[self._severity[top]]
+        return {
+            "risk_level": tier["risk_level"],
+            "reasoning": tier["reasoning"],
+            "relevant_articles": list(tier["relevant_articles"]),
+            "obligations": list(tier["obligations"]),
+            "matched_terms": matched,
+        }
+
+
+def load_rules(path: str = RISK_RULES_PATH) -> RiskMatcher:
+    with open(path, "r", encoding="utf-8") as f:
+        return RiskMatcher(json.load(f))
+
+
+RISK_MATCHER = load_rules()
+
+
+def classify_system(system_description: str, features: Optional[list] = None) -> dict:
+    """Classify a system from its description and optional feature list"""
+    text = system_description or ""
+    if features:
+        text = text + "\n" + "\n".join(str(f) for f in features)
+    return RISK_MATCHER.classify(text)
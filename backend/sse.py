@@ -0,0 +1,192 @@
+"""
+Server-sent event framing for the chat stream.
+
+Text deltas are encoded straight into a pre-serialized frame template
+(byte-identical to json.dumps of {"type": "text", "content": ...}) instead
+of building a dict per token. coalesce_frames() then merges consecutive
+text frames on a small time/size window, so a 500-token answer goes out
+as a few dozen frames instead of 500 tiny writes. The merged frames use
+the same {"type": "text"} protocol, so clients need no changes; setting
+SSE_FLUSH_INTERVAL=0 (or coalesce=false per request) keeps one frame per
+delta. stop_on_disconnect() runs the source in a task of its own so a
+client that goes away stops it right away, not at the next send.
+"""
+
+import asyncio
+import json
+import os
+import time
+from json.encoder import encode_basestring_ascii
+from typing import AsyncIterator, Awaitable, Callable, Set
+
+# Max time a text delta may wait for more text before it is sent (0 disables coalescing)
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL", "0.05"))
+# Flush as soon as this much text is buffered
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", "2048"))
+# Seconds between client-disconnect checks while a stream is open (0 disables polling)
+SSE_DISCONNECT_POLL = float(os.getenv("SSE_DISCONNECT_POLL", "1"))
+# Frames read ahead of a slow client before the source waits (backpressure)
+SSE_QUEUE_FRAMES = int(os.getenv("SSE_QUEUE_FRAMES", "64"))
+
+TEXT_FRAME_PREFIX = 'data: {"type": "text", "content": '
+FRAME_END = '}\n\n'
+
+
+def text_frame(text: str) -> str:
+    """SSE frame for a text delta"""
+    return TEXT_FRAME_PREFIX + encode_basestring_ascii(text) + FRAME_END
+
+
+def event_frame(event_type: str, content, **fields) -> str:
+    """SSE frame for any other event ({"type": ..., "content": ...} plus any extra fields)"""
+    return f"data: {json.dumps({'type': event_type, 'content': content, **fields})}\n\n"
+
+
+def _merge_text_frames(frames) -> str:
+    # Each frame holds one JSON string literal; escapes never cross the
+    # quotes, so the literals can be joined without decoding them.
+    start = len(TEXT_FRAME_PREFIX) + 1
+    end = -len(FRAME_END) - 1
+    return TEXT_FRAME_PREFIX + '"' + "".join(f[start:end] for f in frames) + '"' + FRAME_END
+
+
+async def coalesce_frames(frames: AsyncIterator[str], flush_interval: float = SSE_FLUSH_INTERVAL,
+                          max_bytes: int = SSE_FLUSH_BYTES) -> AsyncIterator[str]:
+    """
+    Merge consecutive text frames from `frames`.
+    The first text frame goes out immediately (time to first token is not
+    delayed); after that text is held for at most `flush_interval` seconds
+    or until `max_bytes` are buffered. Any other frame flushes the buffer
+    and is passed through in order.
+    """
+    if flush_interval <= 0:
+        async for frame in frames:
+            yield frame
+        return
+
+    iterator = frames.__aiter__()
+    pending = []
+    pending_bytes = 0
+    flush_at = 0.0
+    sent_text = False
+    next_frame = None
+    try:
+        while True:
+            if pending or next_frame is not None:
+                if next_frame is None:
+                    next_frame = asyncio.ensure_future(iterator.__anext__())
+                if pending and not next_frame.done():
+                    # Keep waiting on the same task so a flush never cancels the source
+                    done, _ = await asyncio.wait({next_frame}, timeout=max(flush_at - time.monotonic(), 0))
+                    if not done:
+                        yield _merge_text_frames(pending)
+                        pending, pending_bytes = [], 0
+                        continue
+                try:
+                    frame = await next_frame
+                except StopAsyncIteration:
+                    break
+                finally:
+                    if next_frame.done():
+                        next_frame = None
+            else:
+                # Nothing buffered, so there is no flush deadline to race against
+                try:
+                    frame = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+
+            if frame.startswith(TEXT_FRAME_PREFIX):
+                if not sent_text:
+                    sent_text = True
+                    yield frame
+                    continue
+                if not pending:
+                    flush_at = time.monotonic() + flush_interval
+                pending.append(frame)
+                pending_bytes += len(frame)
+                if pending_bytes >= max_bytes:
+                    yield _merge_text_frames(pending)
+                    pending, pending_bytes = [], 0
+                continue
+
+            if pending:
+                yield _merge_text_frames(pending)
+                pending, pending_bytes = [], 0
+            yield frame
+
+        if pending:
+            yield _merge_text_frames(pending)
+    finally:
+        if next_frame is not None and not next_frame.done():
+            next_frame.cancel()
+            # Let the cancellation land before closing the source generator
+            await asyncio.gather(next_frame, return_exceptions=True)
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+_END = object()
+# Producers still cleaning up after their client left (asyncio only keeps weak task references)
+_detached: Set[asyncio.Task] = set()
+
+
+async def stop_on_disconnect(frames: AsyncIterator[str], is_disconnected: Callable[[], Awaitable[bool]],
+                             poll_interval: float = SSE_DISCONNECT_POLL,
+                             max_frames: int = SSE_QUEUE_FRAMES) -> AsyncIterator[str]:
+    """
+    Pass `frames` through, stopping the source as soon as the client is gone.
+
+    The source runs in a task of its own, so a disconnect cancels it even
+    while it is waiting on the model or on tools and sending nothing. It is
+    noticed either way: the server cancelling the response (a failed send or
+    Starlette's disconnect listener) or `is_disconnected` returning True on
+    one of the polls. The source sees CancelledError (or GeneratorExit) and
+    can clean up without the response waiting for it. At most `max_frames`
+    are read ahead of the client; past that the source waits.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_frames)
+
+    async def produce():
+        try:
+            async for frame in frames:
+                await queue.put(frame)
+            await queue.put(_END)
+        except asyncio.CancelledError:
+            # Stopped because the client is gone: drop what it never read so the end marker fits
+            while True:
+                try:
+                    queue.put_nowait(_END)
+                    break
+                except asyncio.QueueFull:
+                    queue.get_nowait()
+            raise
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await frames.aclose()
+
+    async def watch():
+        while not await is_disconnected():
+            await asyncio.sleep(poll_interval)
+        producer.cancel()
+
+    producer = asyncio.ensure_future(produce())
+    watcher = asyncio.ensure_future(watch()) if poll_interval > 0 else None
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                # Also reached when the watcher stopped the source: the client is gone anyway
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if not producer.done():
+            producer.cancel()
+            _detached.add(producer)
+            producer.add_done_callback(_detached.discard)
@@ -0,0 +1,22 @@
+"""
+Shared setup for the backend tests: the backend directory on sys.path and
+an environment that never reaches OpenAI or Tavily (see benchmarks/fakes.py).
+
+Run from backend/:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-fake")
+os.environ["ASSISTANT_STATE_PATH"] = os.path.join(tempfile.mkdtemp(), "assistant_state.json")
+os.environ.setdefault("THREAD_POOL_SIZE", "0")
+os.environ.setdefault("CHAT_MAX_ACTIVE", "0")
+os.environ.setdefault("CHAT_RATE_PER_MINUTE", "0")
+os.environ.setdefault("SSE_DISCONNECT_POLL", "0.05")
@@ -0,0 +1,141 @@
+"""
+Admission control and rate limiting: queue positions, FIFO handoff of
+freed slots, 429s for a full queue or a spent burst, and the error event
+a queue timeout ends the stream with.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import main
+from admission import AdmissionController, AdmissionRejected, RateLimiter
+
+
+async def _post_chat(**kwargs) -> httpx.Response:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await http.post("/api/chat/stream", json={"message": "What is Article 11?"}, **kwargs)
+
+
+def _events(resp: httpx.Response):
+    return [line[6:] for line in resp.text.splitlines() if line.startswith("data: ")]
+
+
+def test_queued_ticket_reports_its_position():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queue=2, queue_timeout=5)
+        first = admission.enter()
+        second = admission.enter()
+        third = admission.enter()
+        assert first.admitted and not second.admitted and not third.admitted
+        assert [admission.position(t) for t in (first, second, third)] == [0, 1, 2]
+
+        positions = []
+
+        async def wait_third():
+            async for position in admission.wait(third, status_interval=0.01):
+                positions.append(position)
+
+        waiting = asyncio.ensure_future(wait_third())
+        await asyncio.sleep(0.05)
+        admission.release(first)
+        await asyncio.sleep(0.05)
+        admission.release(second)
+        await asyncio.wait_for(waiting, 1)
+        return admission, positions, third
+
+    admission, positions, third = asyncio.run(scenario())
+    assert positions == [2, 1]
+    assert third.admitted
+    assert admission.stats()["active"] == 1
+
+
+def test_release_hands_the_slot_to_the_oldest_waiter():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queue=4, queue_timeout=5)
+        running = admission.enter()
+        waiters = [admission.enter() for _ in range(3)]
+        # A waiter that gave up is skipped
+        admission.release(waiters[0])
+
+        admission.release(running)
+        assert admission.active == 1
+        assert [w.admitted for w in waiters] == [False, True, False]
+        # Newcomers queue behind the remaining waiter instead of taking a slot
+        newcomer = admission.enter()
+        assert not newcomer.admitted and admission.position(newcomer) == 2
+
+        admission.release(waiters[1])
+        assert waiters[2].admitted and not newcomer.admitted
+        admission.release(waiters[2])
+        assert newcomer.admitted
+        admission.release(newcomer)
+        admission.release(newcomer)  # safe to repeat
+        return admission
+
+    admission = asyncio.run(scenario())
+    assert admission.stats()["active"] == 0 and admission.stats()["queued"] == 0
+
+
+def test_full_queue_gets_429_with_retry_after(monkeypatch):
+    admission = AdmissionController(max_active=1, max_queue=0, queue_timeout=5)
+    monkeypatch.setattr(main, "CHAT_ADMISSION", admission)
+    admission.enter()
+
+    resp = asyncio.run(_post_chat())
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) >= 1
+    assert resp.json()["reason"] == "queue_full"
+    assert resp.json()["retry_after"] == int(resp.headers["retry-after"])
+
+
+def test_queue_timeout_ends_the_stream_with_retry_after(monkeypatch):
+    admission = AdmissionController(max_active=1, max_queue=1, queue_timeout=0.2)
+    monkeypatch.setattr(main, "CHAT_ADMISSION", admission)
+    admission.enter()
+
+    resp = asyncio.run(_post_chat())
+    # The response had already started when the wait ran out
+    assert resp.status_code == 200
+    events = _events(resp)
+    assert events[-1] == "[DONE]"
+    queue, error = json.loads(events[0]), json.loads(events[-2])
+    assert queue == {"type": "queue", "content": {"position": 1}}
+    assert error["type"] == "error"
+    assert error["reason"] == "queue_timeout"
+    assert error["retry_after"] >= 1
+    assert str(error["retry_after"]) in error["content"]
+    assert admission.stats()["timed_out"] == 1 and admission.stats()["queued"] == 0
+
+
+def test_rate_limiter_refuses_once_the_burst_is_spent(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("admission.time.monotonic", lambda: now[0])
+    limiter = RateLimiter(rate_per_minute=6, burst=2)
+    limiter.check("a")
+    limiter.check("a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.check("a")
+    assert rejected.value.reason == "rate_limited"
+    assert rejected.value.retry_after == 10
+    # Other clients have their own bucket
+    limiter.check("b")
+
+    now[0] += 10
+    limiter.check("a")
+    assert limiter.stats() == {"clients": 2, "limited": 1}
+
+
+def test_rate_limited_chat_gets_429(monkeypatch):
+    monkeypatch.setattr(main, "CHAT_RATE_LIMITER", RateLimiter(rate_per_minute=1, burst=1))
+    monkeypatch.setattr(main, "CHAT_ADMISSION", AdmissionController(max_active=1, max_queue=0))
+    main.CHAT_ADMISSION.enter()  # keep the first request from starting a run
+
+    assert asyncio.run(_post_chat()).status_code == 429  # queue_full, but the token is spent
+    resp = asyncio.run(_post_chat())
+    assert resp.status_code == 429
+    assert resp.json()["reason"] == "rate_limited"
+    assert int(resp.headers["retry-after"]) == 60
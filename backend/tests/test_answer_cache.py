@@ -0,0 +1,47 @@
+from answer_cache import AnswerCache
+
+CV_QUESTION = "Is a CV screening tool a high-risk AI system?"
+ARTICLE_QUESTION = "What are the transparency obligations for chatbots under Article 50?"
+
+
+def _cache(**kwargs) -> AnswerCache:
+    cache = AnswerCache(**kwargs)
+    cache.store(CV_QUESTION, "cv answer", "v1")
+    cache.store(ARTICLE_QUESTION, "article 50 answer", "v1")
+    return cache
+
+
+def test_paraphrase_hits():
+    cache = _cache()
+    entry, similarity = cache.lookup("Are CV screening tools high-risk AI systems?", "v1")
+    assert entry["answer"] == "cv answer"
+    assert similarity >= cache.threshold
+
+    entry, _ = _cache(threshold=0.7).lookup("Which transparency obligations do chatbots have under Article 50?", "v1")
+    assert entry["answer"] == "article 50 answer"
+
+
+def test_different_numbers_miss():
+    cache = _cache(threshold=0.0)
+    assert cache.lookup("What are the transparency obligations for chatbots under Article 52?", "v1") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_namespaces_are_isolated():
+    cache = _cache()
+    assert cache.lookup(CV_QUESTION, "v2") is None
+    cache.store(CV_QUESTION, "v2 answer", "v2")
+    assert cache.lookup(CV_QUESTION, "v2")[0]["answer"] == "v2 answer"
+    assert cache.lookup(CV_QUESTION, "v1")[0]["answer"] == "cv answer"
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("answer_cache.time.time", lambda: now[0])
+    cache = _cache(ttl_seconds=60)
+    assert cache.lookup(CV_QUESTION, "v1") is not None
+
+    now[0] += 61
+    assert cache.lookup(CV_QUESTION, "v1") is None
+    assert cache.lookup("Are CV screening tools high-risk AI systems?", "v1") is None
+    assert cache.stats()["entries"] == 0
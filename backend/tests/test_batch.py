@@ -0,0 +1,130 @@
+"""
+Batch classification: CSV/JSONL parsing, the NDJSON endpoint and the CLI.
+Malformed rows become per-record errors and never stop the rest.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import main
+from batch import classify_chunk, iter_records
+from conftest import BACKEND_DIR
+
+CSV_OK = (
+    "id,system_description,features\n"
+    "cv-1,CV screening tool for hiring,biometric;ranking\n"
+    'chat-1,"Customer support chatbot\nanswering questions",\n'
+    "game-1,Spam filter for a video game forum,\n"
+)
+
+JSONL_OK = (
+    '{"id": "cv-1", "system_description": "CV screening tool for hiring", "features": ["ranking"]}\n'
+    "\n"
+    '{"id": "chat-1", "description": "Customer support chatbot"}\n'
+)
+
+
+def _records(text: str, fmt: str):
+    return list(iter_records(io.StringIO(text, newline=""), fmt))
+
+
+def _classify(text: str, fmt: str):
+    return [json.loads(line) for line in classify_chunk(_records(text, fmt))]
+
+
+def test_csv_records():
+    results = _classify(CSV_OK, "csv")
+    assert [r["id"] for r in results] == ["cv-1", "chat-1", "game-1"]
+    # Lines are physical lines where each row starts; the quoted newline spans 3-4
+    assert [r["line"] for r in results] == [2, 3, 5]
+    assert results[0]["risk_level"] == "High Risk"
+    assert all("error" not in r for r in results)
+
+    chat = _records(CSV_OK, "csv")[1]
+    assert chat["system_description"] == "Customer support chatbot\nanswering questions"
+    assert _records(CSV_OK, "csv")[0]["features"] == ["biometric", "ranking"]
+
+
+def test_jsonl_records():
+    results = _classify(JSONL_OK, "jsonl")
+    assert [(r["id"], r["line"]) for r in results] == [("cv-1", 1), ("chat-1", 3)]
+    assert all("error" not in r for r in results)
+
+
+def test_malformed_jsonl_line_is_an_error_record():
+    text = JSONL_OK + '{"id": "broken", \n[1, 2]\n{"id": "ok-2", "system_description": "Spam filter"}\n'
+    results = _classify(text, "jsonl")
+    assert [r.get("id") for r in results] == ["cv-1", "chat-1", None, None, "ok-2"]
+    assert results[2]["line"] == 4 and results[2]["error"].startswith("invalid JSON")
+    assert results[3] == {"line": 5, "error": "expected a JSON object"}
+    assert "error" not in results[4]
+
+
+def test_stray_quote_in_unquoted_field():
+    text = 'id,system_description\n1,Monitor with 27" screen\n2,CV screening tool\n3,Spam filter\n'
+    results = _classify(text, "csv")
+    assert [r["id"] for r in results] == ["1", "2", "3"]
+    assert results[0]["line"] == 2
+    assert all("error" not in r for r in results)
+
+
+def test_unterminated_quote_at_eof():
+    text = 'id,system_description\n1,CV screening tool\n2,"Spam filter\nthat never closes\n'
+    results = _classify(text, "csv")
+    assert results[0]["id"] == "1" and "error" not in results[0]
+    assert results[1] == {"line": 3, "error": "invalid CSV: unexpected end of data"}
+
+
+def test_oversized_field_is_reported_and_reading_continues(monkeypatch):
+    # The csv module keeps the limit process-wide; put it back afterwards
+    monkeypatch.setattr("batch.BATCH_MAX_FIELD_CHARS", 100)
+    text = 'id,system_description\n1,"opened\n' + "filler\n" * 50 + "9,CV screening tool\n"
+    limit = csv.field_size_limit()
+    try:
+        records = _records(text, "csv")
+    finally:
+        csv.field_size_limit(limit)
+    assert records[0]["line"] == 2 and "field larger than field limit" in records[0]["error"]
+    assert records[-1]["id"] == "9" and "error" not in records[-1]
+
+
+def test_endpoint_streams_errors_and_results(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(main, "get_executor", lambda: executor)
+    body = 'id,system_description\n1,Monitor with 27" screen\n2,CV screening tool\n3,"never closed\n'
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/api/classify/batch?format=csv", content=body)
+
+    try:
+        resp = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert resp.status_code == 200
+    results = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r.get("id") for r in results] == ["1", "2", None]
+    assert results[2]["error"] == "invalid CSV: unexpected end of data"
+
+
+def test_cli(tmp_path):
+    src = tmp_path / "systems.csv"
+    src.write_text(CSV_OK + '4,"never closed\n', encoding="utf-8")
+    out = tmp_path / "results.ndjson"
+    proc = subprocess.run(
+        [sys.executable, "batch.py", str(src), "-o", str(out), "--workers", "1"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60, env=dict(os.environ),
+    )
+    assert proc.returncode == 0, proc.stderr
+    results = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r.get("id") for r in results] == ["cv-1", "chat-1", "game-1", None]
+    assert "Classified 4 records" in proc.stderr
@@ -0,0 +1,102 @@
+"""
+Search result caches: TTL expiry, LRU eviction under the byte budget and
+hit/miss counters, for the in-memory and the SQLite backend alike.
+"""
+
+import pytest
+
+from cache import SQLiteCache, TTLCache, _entry_size, build_cache, make_cache_key
+
+# Each value serializes to 16 bytes
+VALUES = {key: key * 14 for key in "abcd"}
+ENTRY = _entry_size('"' + "a" * 14 + '"')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake clock; each read advances it 1ms so access order is well defined"""
+    now = [1000.0]
+
+    def time():
+        now[0] += 0.001
+        return now[0]
+
+    monkeypatch.setattr("cache.time.time", time)
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(ttl_seconds: float = 60, max_bytes: int = 1024):
+        if request.param == "memory":
+            return TTLCache(ttl_seconds, max_bytes)
+        return SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl_seconds, max_bytes)
+    return make
+
+
+def test_hits_and_misses(make_cache, clock):
+    cache = make_cache()
+    assert cache.get("a") is None
+    cache.set("a", {"results": [1, 2]})
+    assert cache.get("a") == {"results": [1, 2]}
+    assert cache.get("a") == {"results": [1, 2]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    cache = make_cache(ttl_seconds=10)
+    cache.set("a", VALUES["a"])
+    clock[0] += 9
+    assert cache.get("a") == VALUES["a"]
+    clock[0] += 2
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"], stats["entries"]) == (1, 1, 1, 0)
+
+
+def test_least_recently_used_is_evicted_over_the_byte_budget(make_cache, clock):
+    cache = make_cache(max_bytes=3 * ENTRY)
+    for key in "abc":
+        cache.set(key, VALUES[key])
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == VALUES["a"]
+    cache.set("d", VALUES["d"])
+
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == [VALUES[key] for key in "acd"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 3 and stats["bytes"] == 3 * ENTRY
+
+
+def test_oversized_values_are_not_cached(make_cache, clock):
+    cache = make_cache(max_bytes=ENTRY)
+    cache.set("a", VALUES["a"])
+    cache.set("big", "x" * 100)
+    assert cache.get("big") is None
+    assert cache.get("a") == VALUES["a"]
+
+
+def test_sqlite_cache_is_shared_through_its_file(tmp_path, clock):
+    path = str(tmp_path / "shared.sqlite3")
+    SQLiteCache(path, 60, 1024).set("a", VALUES["a"])
+    # Another worker opening the same file sees the entry; counters are per process
+    other = SQLiteCache(path, 60, 1024)
+    assert other.get("a") == VALUES["a"]
+    assert other.stats()["hits"] == 1
+
+
+def test_build_cache_picks_the_backend(tmp_path):
+    assert isinstance(build_cache(60, 1024), TTLCache)
+    assert isinstance(build_cache(60, 1024, str(tmp_path / "c.sqlite3")), SQLiteCache)
+    # An unusable path falls back to memory instead of failing startup
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    assert isinstance(build_cache(60, 1024, str(blocker / "c.sqlite3")), TTLCache)
+
+
+def test_cache_keys_ignore_case_spacing_and_domain_order():
+    key = make_cache_key("  Article  11 ", ["b.eu", "a.eu"], 5)
+    assert key == make_cache_key("article 11", ["a.eu", "b.eu"], 5)
+    assert key != make_cache_key("article 11", ["a.eu", "b.eu"], 3)
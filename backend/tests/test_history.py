@@ -0,0 +1,118 @@
+"""
+Thread history: /api/threads/{id}/messages pages with cursors, and the
+incremental cache picks up a new run's messages with one small list call.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import history
+import main
+from benchmarks.fakes import FakeAsyncOpenAI, _message
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeAsyncOpenAI(tokens_per_answer=3, token_delay=0, first_token_delay=0, api_latency=0)
+    main.client = fake
+    main.GLOBAL_ASSISTANT_ID = None
+    # Small list pages so a sync has to follow OpenAI's cursor too
+    monkeypatch.setattr(history, "HISTORY_FETCH_LIMIT", 2)
+    return fake
+
+
+async def _turn(thread_id: str, message: str) -> None:
+    assistant_id = await main.get_singleton_assistant()
+    frames = [f async for f in main.stream_generator(thread_id, assistant_id, message)]
+    assert frames[-1] == "data: [DONE]\n\n"
+
+
+async def _page(http: httpx.AsyncClient, thread_id: str, **params) -> dict:
+    resp = await http.get(f"/api/threads/{thread_id}/messages", params=params)
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def _http() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+
+def test_pagination_cursors(fake):
+    async def scenario():
+        thread_id = (await fake.beta.threads.create()).id
+        for i in range(3):
+            await _turn(thread_id, f"question {i}")
+        expected = [m.id for m in fake.messages[thread_id]]
+
+        async with _http() as http:
+            pages, cursor = [], None
+            while True:
+                params = {"limit": 2, **({"after": cursor} if cursor else {})}
+                page = await _page(http, thread_id, **params)
+                pages.append(page)
+                cursor = page["next_cursor"]
+                if not page["has_more"]:
+                    break
+            newest_first = await _page(http, thread_id, order="desc", limit=4)
+            unknown = await http.get(f"/api/threads/{thread_id}/messages", params={"after": "msg_nope"})
+            bad_order = await http.get(f"/api/threads/{thread_id}/messages", params={"order": "sideways"})
+        return expected, pages, newest_first, unknown, bad_order
+
+    expected, pages, newest_first, unknown, bad_order = asyncio.run(scenario())
+    assert len(expected) == 6
+    assert [[m["id"] for m in p["messages"]] for p in pages] == [expected[0:2], expected[2:4], expected[4:6]]
+    assert [p["has_more"] for p in pages] == [True, True, False]
+    assert pages[-1]["next_cursor"] is None
+    assert [m["role"] for m in pages[0]["messages"]] == ["user", "assistant"]
+    assert pages[0]["messages"][0]["content"] == "question 0"
+    assert pages[0]["messages"][1]["content"] == "tok0 tok1 tok2 "
+    assert [m["id"] for m in newest_first["messages"]] == expected[::-1][:4]
+    assert newest_first["has_more"] and newest_first["next_cursor"] == expected[2]
+    assert unknown.status_code == 400
+    assert bad_order.status_code == 400
+
+
+def test_new_run_is_picked_up_incrementally(fake):
+    async def scenario():
+        thread_id = (await fake.beta.threads.create()).id
+        await _turn(thread_id, "first")
+        async with _http() as http:
+            first = await _page(http, thread_id)
+            calls_before = main.THREAD_HISTORY.list_calls
+            fetched_before = main.THREAD_HISTORY.fetched_messages
+
+            await _turn(thread_id, "second")
+            second = await _page(http, thread_id)
+            calls = main.THREAD_HISTORY.list_calls - calls_before
+            fetched = main.THREAD_HISTORY.fetched_messages - fetched_before
+        return first, second, calls, fetched
+
+    first, second, calls, fetched = asyncio.run(scenario())
+    assert [m["content"] for m in first["messages"]] == ["first", "tok0 tok1 tok2 "]
+    assert [m["content"] for m in second["messages"]] == ["first", "tok0 tok1 tok2 ", "second", "tok0 tok1 tok2 "]
+    # Only the new messages were fetched, after the newest cached one
+    assert (calls, fetched) == (1, 2)
+
+
+def test_messages_still_being_written_are_fetched_again(fake):
+    async def scenario():
+        thread_id = (await fake.beta.threads.create()).id
+        await _turn(thread_id, "first")
+        writing = _message(thread_id, "assistant", "partial")
+        writing.status = "in_progress"
+        fake.messages[thread_id].append(writing)
+
+        async with _http() as http:
+            during = await _page(http, thread_id)
+            writing.status = "completed"
+            writing.content[0].text.value = "partial, now complete"
+            after = await _page(http, thread_id)
+        return during, after
+
+    during, after = asyncio.run(scenario())
+    assert during["messages"][-1]["status"] == "in_progress"
+    assert after["messages"][-1]["content"] == "partial, now complete"
+    assert after["messages"][-1]["status"] == "completed"
+    assert len(after["messages"]) == 3
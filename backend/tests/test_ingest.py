@@ -0,0 +1,106 @@
+"""
+Local ingestion of uploaded PDFs: classify_risk reads an ingested file by
+its ID, and only files it can read are named to the model.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import main
+from benchmarks.fakes import FakeAsyncOpenAI
+from tools import classify_risk
+
+PDF_TEXT = "Our product is a CV screening tool used in recruitment"
+
+
+def _pdf(text: str) -> bytes:
+    """A one-page PDF showing `text`"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(main, "get_executor", lambda: executor)
+    fake = FakeAsyncOpenAI(tokens_per_answer=2, token_delay=0, first_token_delay=0, api_latency=0)
+    main.client = fake
+    main.GLOBAL_ASSISTANT_ID = None
+    yield fake
+    executor.shutdown()
+
+
+async def _upload(content: bytes, filename: str, extract: bool) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        resp = await http.post(f"/api/upload?extract={str(extract).lower()}",
+                               files={"file": (filename, content, "application/pdf")})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_classify_risk_reads_an_ingested_upload(fake):
+    uploaded = asyncio.run(_upload(_pdf(PDF_TEXT), "product.pdf", extract=True))
+    assert uploaded["document"]["status"] == "extracted"
+    file_id = uploaded["file_id"]
+
+    # The description alone matches nothing; the document text does
+    assert classify_risk("Our product")["risk_level"] != "High Risk"
+    result = classify_risk("Our product", file_id=file_id)
+    assert result["risk_level"] == "High Risk"
+    assert {"cv screening", "recruitment"} <= {m["term"] for m in result["matched_terms"]}
+    # Unknown IDs fall back to the description
+    assert classify_risk("Our product", file_id="file-unknown") == classify_risk("Our product")
+
+
+def test_only_readable_files_are_named_to_the_model(fake):
+    async def scenario():
+        ingested = (await _upload(_pdf(PDF_TEXT), "product.pdf", extract=True))["file_id"]
+        remote_only = (await _upload(_pdf("Another document"), "other.pdf", extract=False))["file_id"]
+        broken = await _upload(b"%PDF-1.4 not really a pdf", "broken.pdf", extract=True)
+        assert broken["document"]["status"] == "failed"
+
+        assistant_id = await main.get_singleton_assistant()
+        thread = await fake.beta.threads.create()
+        file_ids = [ingested, remote_only, broken["file_id"]]
+        frames = [f async for f in main.stream_generator(thread.id, assistant_id, "Classify it", file_ids)]
+        return ingested, file_ids, frames
+
+    ingested, file_ids, frames = asyncio.run(scenario())
+    assert frames[-1] == "data: [DONE]\n\n"
+    run = next(iter(fake.runs.values()))
+    instructions = run["options"]["additional_instructions"]
+    assert ingested in instructions
+    assert file_ids[1] not in instructions and file_ids[2] not in instructions
+
+
+def test_no_instruction_without_readable_files(fake):
+    async def scenario():
+        remote_only = (await _upload(_pdf("A spam filter"), "filter.pdf", extract=False))["file_id"]
+        assistant_id = await main.get_singleton_assistant()
+        thread = await fake.beta.threads.create()
+        return [f async for f in main.stream_generator(thread.id, assistant_id, "Classify it", [remote_only])]
+
+    asyncio.run(scenario())
+    run = next(iter(fake.runs.values()))
+    assert "additional_instructions" not in run["options"]
@@ -0,0 +1,143 @@
+"""
+Run limits in stream_generator: the tool round cap, the run deadline
+(stalled tools or a stalled model, with and without coalescing), terminal
+failures, and a client cancel racing the deadline timer.
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+import pytest
+
+import main
+from benchmarks.fakes import FakeAsyncOpenAI
+from sse import coalesce_frames
+
+CLASSIFY_CALL = [{"name": "classify_risk", "arguments": {"system_description": "CV screening tool"}}]
+
+
+async def _start(fake: FakeAsyncOpenAI):
+    """(thread_id, assistant_id) on the fake backend"""
+    main.client = fake
+    main.GLOBAL_ASSISTANT_ID = None
+    assistant_id = await main.get_singleton_assistant()
+    thread = await fake.beta.threads.create()
+    return thread.id, assistant_id
+
+
+async def _run(fake: FakeAsyncOpenAI, coalesce: bool = False):
+    thread_id, assistant_id = await _start(fake)
+    frames = main.stream_generator(thread_id, assistant_id, "Is CV screening high-risk?")
+    if coalesce:
+        frames = coalesce_frames(frames, 0.05)
+    return [frame async for frame in frames]
+
+
+def _events(frames):
+    return [json.loads(f[6:]) if f != "data: [DONE]\n\n" else "[DONE]" for f in frames]
+
+
+def _cancelling() -> int:
+    cancelling = getattr(asyncio.current_task(), "cancelling", None)
+    return cancelling() if cancelling is not None else 0
+
+
+def test_tool_round_cap_cancels_the_run(monkeypatch):
+    monkeypatch.setattr(main, "RUN_MAX_TOOL_ROUNDS", 2)
+    fake = FakeAsyncOpenAI(tool_calls=CLASSIFY_CALL, tool_rounds=5, first_token_delay=0.01, api_latency=0)
+
+    events = _events(asyncio.run(_run(fake)))
+    assert events[-1] == "[DONE]"
+    assert events[-2] == {"type": "error", "content": "Run needed more than 2 tool rounds"}
+    assert [e for e in events if e != "[DONE]" and e["type"] == "text"] == []
+    assert len(fake.submitted) == 2
+    assert fake.cancelled == list(fake.runs)
+
+
+@pytest.mark.parametrize("coalesce", [False, True])
+@pytest.mark.parametrize("stall", ["tools", "model"])
+def test_deadline_aborts_a_stalled_run(monkeypatch, stall, coalesce):
+    monkeypatch.setattr(main, "RUN_DEADLINE", 0.3)
+    if stall == "tools":
+        async def stalled_tools(tool_calls, timings=None):
+            await asyncio.sleep(60)
+        monkeypatch.setattr(main, "dispatch_tool_calls", stalled_tools)
+        fake = FakeAsyncOpenAI(tool_calls=CLASSIFY_CALL, first_token_delay=0.01, api_latency=0)
+    else:
+        # Text starts flowing, then the model goes quiet
+        fake = FakeAsyncOpenAI(tokens_per_answer=3, token_delay=60, first_token_delay=0.01, api_latency=0)
+
+    async def scenario():
+        started = time.monotonic()
+        frames = await _run(fake, coalesce)
+        return frames, time.monotonic() - started, _cancelling()
+
+    frames, elapsed, cancelling = asyncio.run(scenario())
+    events = _events(frames)
+    assert elapsed < 2
+    assert events[-1] == "[DONE]"
+    assert events[-2] == {"type": "error", "content": "Run did not finish within 0.3 seconds"}
+    assert fake.cancelled == list(fake.runs)
+    # The deadline's own cancellation was taken back
+    assert cancelling == 0
+    if stall == "model":
+        assert any(e != "[DONE]" and e["type"] == "text" for e in events)
+
+
+@pytest.mark.parametrize("status, message", [
+    ("failed", "Run failed: Fake failure"),
+    ("expired", "Run expired before it could finish"),
+])
+def test_terminal_failures_pass_through(status, message):
+    fake = FakeAsyncOpenAI(tokens_per_answer=2, token_delay=0, first_token_delay=0.01, api_latency=0,
+                           final_status=status)
+    events = _events(asyncio.run(_run(fake)))
+    assert events[-2:] == [{"type": "error", "content": message}, "[DONE]"]
+
+
+def test_client_cancel_propagates_through_the_run():
+    fake = FakeAsyncOpenAI(first_token_delay=60, api_latency=0)
+
+    async def scenario():
+        consumer = asyncio.ensure_future(_run(fake))
+        while not fake.runs:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+
+    asyncio.run(scenario())
+    assert fake.cancelled == list(fake.runs)
+
+
+def test_client_cancel_is_not_swallowed_by_the_deadline():
+    async def stalled():
+        await asyncio.sleep(60)
+        yield "never"
+
+    async def consume(events):
+        return [event async for event in events]
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        consumer = asyncio.ensure_future(consume(main.events_until(stalled(), time.monotonic() + 0.05)))
+        await asyncio.sleep(0.01)
+        loop.call_later(0.06, consumer.cancel)
+        # Block the loop past both timers so the deadline and the client cancel land together
+        time.sleep(0.1)
+        try:
+            await consumer
+        except asyncio.CancelledError:
+            return "cancelled"
+        except main.RunAborted:
+            return "aborted"
+
+    outcome = asyncio.run(scenario())
+    if sys.version_info >= (3, 11):
+        assert outcome == "cancelled"
+    else:
+        # Without Task.uncancel the two cannot be told apart; the run is stopped either way
+        assert outcome in ("cancelled", "aborted")
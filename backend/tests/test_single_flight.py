@@ -0,0 +1,109 @@
+"""
+SingleFlight: concurrent callers with one key share one call, its result
+and its error, whether they are coroutines or threads.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.fakes import FakeTavilyClient
+from cache import SingleFlight
+
+
+def test_async_callers_share_one_result():
+    async def scenario():
+        flight = SingleFlight()
+        tavily = FakeTavilyClient(latency=0.05)
+        calls = []
+
+        async def search():
+            calls.append(1)
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: tavily.search("Article 11"))
+
+        results = await asyncio.gather(*[flight.do_async("article-11", search) for _ in range(10)])
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 9}
+
+
+def test_async_callers_share_one_error():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            raise RuntimeError("search failed")
+
+        results = await asyncio.gather(*[flight.do_async("q", fail) for _ in range(5)], return_exceptions=True)
+        # The failure is not cached: the next call runs again
+        retry = await flight.do_async("q", lambda: asyncio.sleep(0, result="ok"))
+        return calls, results, retry
+
+    calls, results, retry = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) and str(r) == "search failed" for r in results)
+    assert retry == "ok"
+
+
+def test_leader_failing_to_start_does_not_wedge_the_key():
+    async def scenario():
+        flight = SingleFlight()
+        executor = ThreadPoolExecutor(max_workers=1)
+        executor.shutdown()
+
+        def search():
+            # Raises synchronously, before there is a coroutine to await
+            return asyncio.get_running_loop().run_in_executor(executor, lambda: "never")
+
+        with pytest.raises(RuntimeError, match="shutdown"):
+            await flight.do_async("q", search)
+        assert flight.stats()["in_flight"] == 0
+        # The next caller leads a fresh call instead of waiting forever
+        result = await asyncio.wait_for(flight.do_async("q", lambda: asyncio.sleep(0, result="ok")), 1)
+        return flight, result
+
+    flight, result = asyncio.run(scenario())
+    assert result == "ok"
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 0}
+
+
+def test_threads_share_one_result_and_error():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work(value):
+        calls.append(value)
+        release.wait(5)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, "k", lambda: work(object())) for _ in range(8)]
+        while flight.stats()["coalesced"] < 7:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [f.result() for f in futures]
+    assert len(calls) == 1
+    assert all(result is calls[0] for result in results)
+
+    release.clear()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, "k", lambda: work(ValueError("boom"))) for _ in range(4)]
+        while flight.stats()["coalesced"] < 10:
+            threading.Event().wait(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+    assert len(calls) == 2
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,111 @@
+"""
+SSE framing and coalescing: pre-serialized text frames match json.dumps
+byte for byte, merged frames keep order and size limits, and closing a
+coalesced stream mid-wait leaves no source task behind.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from sse import coalesce_frames, event_frame, text_frame
+
+TRICKY_TEXTS = ['say "hi"', "back\\slash \\n", "naïve – 日本語 😀", "tab\tnew\nline", " \x00", ""]
+
+
+def _json_frame(text: str) -> str:
+    return f"data: {json.dumps({'type': 'text', 'content': text})}\n\n"
+
+
+async def _source(frames, delay: float = 0.0, stall: bool = False, closed: list = None):
+    try:
+        for frame in frames:
+            yield frame
+            await asyncio.sleep(delay)
+        if stall:
+            await asyncio.sleep(60)
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+async def _collect(frames, **kwargs):
+    return [frame async for frame in coalesce_frames(frames, **kwargs)]
+
+
+@pytest.mark.parametrize("text", TRICKY_TEXTS)
+def test_text_frame_matches_json_dumps(text):
+    assert text_frame(text) == _json_frame(text)
+
+
+def test_merged_text_matches_json_dumps():
+    frames = [text_frame(t) for t in TRICKY_TEXTS]
+    out = asyncio.run(_collect(_source(frames), flush_interval=10))
+    # The first delta goes out alone, the rest are merged into one frame
+    assert out == [_json_frame(TRICKY_TEXTS[0]), _json_frame("".join(TRICKY_TEXTS[1:]))]
+    assert "".join(json.loads(f[6:])["content"] for f in out) == "".join(TRICKY_TEXTS)
+
+
+def test_other_frames_flush_pending_text_in_order():
+    status = event_frame("status", "Processing tool calls...")
+    frames = [text_frame("a"), text_frame("b"), text_frame("c"), status, text_frame("d"), "data: [DONE]\n\n"]
+    out = asyncio.run(_collect(_source(frames), flush_interval=10))
+    assert out == [text_frame("a"), _json_frame("bc"), status, text_frame("d"), "data: [DONE]\n\n"]
+
+
+def test_flush_bytes_limit():
+    frames = [text_frame(str(i) * 10) for i in range(7)]
+    max_bytes = 2 * len(frames[1])
+    out = asyncio.run(_collect(_source(frames), flush_interval=10, max_bytes=max_bytes))
+    contents = [json.loads(f[6:])["content"] for f in out]
+    assert contents == ["0" * 10, "1" * 10 + "2" * 10, "3" * 10 + "4" * 10, "5" * 10 + "6" * 10]
+
+
+def test_flush_interval_sends_text_that_waits_too_long():
+    frames = [text_frame("a"), text_frame("b"), text_frame("c")]
+    out = asyncio.run(_collect(_source(frames, delay=0.2), flush_interval=0.05))
+    assert out == [text_frame("a"), text_frame("b"), text_frame("c")]
+
+
+def test_zero_interval_passes_frames_through():
+    frames = [text_frame("a"), text_frame("b"), event_frame("status", "x"), text_frame("c")]
+    out = asyncio.run(_collect(_source(frames), flush_interval=0))
+    assert out == frames
+
+
+def test_aclose_mid_wait_does_not_leak_the_source_task():
+    async def scenario():
+        closed = []
+        coalesced = coalesce_frames(_source([text_frame("a"), text_frame("b")], stall=True, closed=closed),
+                                    flush_interval=0.05)
+        assert await coalesced.__anext__() == text_frame("a")
+        # "b" is flushed by the timer while the read of the next frame is still pending
+        assert await coalesced.__anext__() == text_frame("b")
+        await coalesced.aclose()
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return closed, others
+
+    closed, others = asyncio.run(scenario())
+    assert closed == [True]
+    assert others == []
+
+
+def test_cancel_mid_wait_does_not_leak_the_source_task():
+    async def scenario():
+        closed = []
+        coalesced = coalesce_frames(_source([text_frame("a"), text_frame("b")], stall=True, closed=closed),
+                                    flush_interval=10)
+        assert await coalesced.__anext__() == text_frame("a")
+        # Blocks in the flush wait with "b" pending and the source stalled
+        reader = asyncio.ensure_future(coalesced.__anext__())
+        await asyncio.sleep(0.05)
+        reader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await reader
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return closed, others
+
+    closed, others = asyncio.run(scenario())
+    assert closed == [True]
+    assert others == []
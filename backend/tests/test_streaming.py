@@ -0,0 +1,144 @@
+"""
+Chat streaming against the fake Assistants backend (benchmarks/fakes.py):
+concurrent streams overlap, a client that leaves cancels its run, and a
+Last-Event-ID reconnect replays the missed frames without gaps.
+
+The app runs on a real uvicorn server on a free port, since disconnects
+are only delivered the way production sees them over a socket.
+"""
+
+import asyncio
+import contextlib
+import json
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+import uvicorn
+
+import main
+from benchmarks.fakes import FakeAsyncOpenAI
+from replay import ReplayBuffers
+
+
+def _answer(tokens: int) -> str:
+    return "".join(f"tok{i} " for i in range(tokens))
+
+
+@contextlib.asynccontextmanager
+async def _serve(fake: FakeAsyncOpenAI, grace: float = 15):
+    """An HTTP client for the app served over a socket, talking to `fake`"""
+    main.client = fake
+    main.GLOBAL_ASSISTANT_ID = None
+    main.REPLAY_BUFFERS = ReplayBuffers(grace=grace)
+    await main.get_singleton_assistant()
+    # No lifespan: startup would warm up the real client and shutdown closes shared clients
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    serving = asyncio.ensure_future(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=10) as http:
+            yield http
+    finally:
+        await main.REPLAY_BUFFERS.aclose()
+        server.should_exit = True
+        await serving
+
+
+async def _read(resp: httpx.Response, stop_after_text: Optional[int] = None) -> Tuple[List[str], str, bool]:
+    """(event IDs, streamed text, whether [DONE] arrived), optionally leaving after some text frames"""
+    ids, text, done = [], [], False
+    texts = 0
+    async for line in resp.aiter_lines():
+        if line.startswith("id: "):
+            ids.append(line[4:])
+        elif line == "data: [DONE]":
+            done = True
+        elif line.startswith("data: "):
+            event = json.loads(line[6:])
+            if event["type"] == "text":
+                text.append(event["content"])
+                texts += 1
+                if texts == stop_after_text:
+                    break
+    return ids, "".join(text), done
+
+
+def _seqs(ids: List[str]) -> List[int]:
+    return [int(event_id.rpartition(":")[2]) for event_id in ids]
+
+
+def test_streams_overlap():
+    async def scenario():
+        fake = FakeAsyncOpenAI(tokens_per_answer=20, token_delay=0.02)
+        streams = 20
+        async with _serve(fake) as http:
+            async def one():
+                async with http.stream("POST", "/api/chat/stream", json={"message": "What is Article 11?"}) as resp:
+                    return await _read(resp)
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*[one() for _ in range(streams)])
+            wall = time.perf_counter() - started
+
+        single = fake.first_token_delay + fake.tokens_per_answer * fake.token_delay + 3 * fake.api_latency
+        for _, text, done in results:
+            assert text == _answer(fake.tokens_per_answer)
+            assert done
+        # Serialized streams would take about streams * single
+        assert wall < single * streams / 4
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_cancels_run():
+    async def scenario():
+        fake = FakeAsyncOpenAI(tokens_per_answer=200, token_delay=0.02)
+        async with _serve(fake, grace=0) as http:
+            async with http.stream("POST", "/api/chat/stream", json={"message": "hi"}) as resp:
+                _, text, done = await _read(resp, stop_after_text=3)
+            assert text and not done
+
+            for _ in range(100):
+                if fake.cancelled and main.CHAT_ADMISSION.active == 0:
+                    break
+                await asyncio.sleep(0.02)
+            assert len(fake.cancelled) == 1
+            assert main.CHAT_ADMISSION.active == 0
+            assert main.REPLAY_BUFFERS.stats()["live"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_last_event_id_resume_has_no_gaps():
+    async def scenario():
+        fake = FakeAsyncOpenAI(tokens_per_answer=40, token_delay=0.02)
+        async with _serve(fake) as http:
+            body = {"message": "hi", "coalesce": False}
+            async with http.stream("POST", "/api/chat/stream", json=body) as resp:
+                first_ids, first_text, done = await _read(resp, stop_after_text=5)
+            assert not done
+            stream_id = first_ids[-1].rpartition(":")[0]
+
+            # Reconnect the way EventSource does, on the same URL with Last-Event-ID
+            headers = {"Last-Event-ID": first_ids[-1]}
+            async with http.stream("POST", "/api/chat/stream", json=body, headers=headers) as resp:
+                assert resp.status_code == 200
+                rest_ids, rest_text, done = await _read(resp)
+            assert done
+
+            seqs = _seqs(first_ids + rest_ids)
+            assert seqs == list(range(1, len(seqs) + 1))
+            assert first_text + rest_text == _answer(fake.tokens_per_answer)
+            assert fake.cancelled == []
+
+            # The finished stream replays in full; unknown streams are gone
+            async with http.stream("GET", f"/api/chat/stream/{stream_id}") as resp:
+                replay_ids, replay_text, done = await _read(resp)
+            assert replay_ids == first_ids + rest_ids
+            assert replay_text == _answer(fake.tokens_per_answer) and done
+            assert (await http.get("/api/chat/stream/unknown")).status_code == 404
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+"""
+Tool dispatch: the calls of one run step run concurrently, come back in
+call order, and a slow, failing or malformed call turns into a structured
+error output instead of failing the run.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+import tools
+from benchmarks.fakes import FakeTavilyClient
+from metrics import RunTimings
+
+
+def _call(call_id: str, name: str, arguments) -> SimpleNamespace:
+    if not isinstance(arguments, str):
+        arguments = json.dumps(arguments)
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+@pytest.fixture
+def slow_tools(monkeypatch):
+    """
+    run_tool stand-in: sleeps args["sleep"] seconds, raises on args["fail"], echoes args["q"].
+    search_web goes its own way (cache, coalescing) to a fake Tavily that takes 0.6s.
+    """
+    def run_tool(function_name, args):
+        time.sleep(args.get("sleep", 0))
+        if args.get("fail"):
+            raise RuntimeError("upstream exploded")
+        return f"{function_name}:{args['q']}"
+
+    monkeypatch.setattr(tools, "run_tool", run_tool)
+    monkeypatch.setattr(tools, "tavily_client", FakeTavilyClient(latency=0.6))
+    monkeypatch.setattr(tools, "REGULATION_INDEX", None)
+    monkeypatch.setattr(tools, "TOOL_TIMEOUTS", {"search_web": 0.2, "classify_risk": 1})
+
+
+def test_calls_run_concurrently_in_call_order(slow_tools):
+    calls = [_call(f"call_{i}", "classify_risk", {"q": str(i), "sleep": 0.3 - i * 0.1}) for i in range(3)]
+
+    started = time.monotonic()
+    outputs = asyncio.run(tools.dispatch_tool_calls(calls))
+    elapsed = time.monotonic() - started
+
+    # The first call finishes last, yet results keep the call order
+    assert outputs == [{"tool_call_id": f"call_{i}", "output": f"classify_risk:{i}"} for i in range(3)]
+    assert elapsed < 0.5
+
+
+def test_timeout_is_a_structured_error_and_the_rest_still_arrive(slow_tools):
+    calls = [
+        _call("call_fast", "classify_risk", {"q": "a", "sleep": 0.05}),
+        # A query of its own, so no earlier search answers it from the cache
+        _call("call_slow", "search_web", {"query": f"article 11 {uuid.uuid4()}"}),
+        _call("call_failing", "classify_risk", {"q": "c", "fail": True}),
+        _call("call_bad_args", "search_web", "{not json"),
+        _call("call_last", "classify_risk", {"q": "d"}),
+    ]
+    timings = RunTimings()
+
+    started = time.monotonic()
+    outputs = asyncio.run(tools.dispatch_tool_calls(calls, timings=timings))
+    elapsed = time.monotonic() - started
+
+    assert [o["tool_call_id"] for o in outputs] == [c.id for c in calls]
+    assert outputs[0]["output"] == "classify_risk:a"
+    assert outputs[4]["output"] == "classify_risk:d"
+    assert json.loads(outputs[1]["output"]) == {
+        "error": "timeout", "tool": "search_web", "detail": "Tool did not finish within 0.2 seconds"
+    }
+    assert json.loads(outputs[2]["output"]) == {
+        "error": "tool_failed", "tool": "classify_risk", "detail": "upstream exploded"
+    }
+    assert json.loads(outputs[3]["output"])["error"] == "invalid_arguments"
+    # The run waited for the timeout, not for the slow tool
+    assert elapsed < 0.5
+    assert sorted(t["outcome"] for t in timings.tools) == ["error", "ok", "ok", "timeout"]
+
+
+def test_concurrency_is_capped_per_step(slow_tools, monkeypatch):
+    monkeypatch.setattr(tools, "TOOL_MAX_CONCURRENCY", 2)
+    calls = [_call(f"call_{i}", "classify_risk", {"q": str(i), "sleep": 0.15}) for i in range(4)]
+
+    started = time.monotonic()
+    outputs = asyncio.run(tools.dispatch_tool_calls(calls))
+    elapsed = time.monotonic() - started
+
+    assert [o["output"] for o in outputs] == [f"classify_risk:{i}" for i in range(4)]
+    # Two waves of two
+    assert 0.3 <= elapsed < 0.55
@@ -0,0 +1,140 @@
+"""
+Pool of pre-created OpenAI threads.
+
+New conversations take a thread from the pool instead of waiting on
+threads.create() before the first token. The pool refills in the
+background after every take, and threads that sit unused longer than
+max_idle are deleted and replaced.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+# Serverless instances are frozen or dropped without running shutdown hooks, so pooled
+# threads would leak on every cold start; the pool is off there unless sized explicitly
+SERVERLESS = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "0" if SERVERLESS else "4"))
+THREAD_POOL_MAX_IDLE = float(os.getenv("THREAD_POOL_MAX_IDLE", "3600"))
+THREAD_POOL_SWEEP_INTERVAL = float(os.getenv("THREAD_POOL_SWEEP_INTERVAL", "60"))
+
+
+class ThreadPool:
+    def __init__(self, get_client: Callable[[], Any], size: int = THREAD_POOL_SIZE,
+                 max_idle: float = THREAD_POOL_MAX_IDLE,
+                 sweep_interval: float = THREAD_POOL_SWEEP_INTERVAL):
+        self._get_client = get_client
+        self.size = size
+        self.max_idle = max_idle
+        self.sweep_interval = sweep_interval
+        self._threads: deque = deque()  # (thread_id, created_at)
+        self._refill_task: Optional[asyncio.Task] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.evicted = 0
+
+    async def acquire(self) -> str:
+        """Return a ready thread ID, creating one inline only when the pool is empty"""
+        now = time.monotonic()
+        while self._threads:
+            thread_id, created_at = self._threads.popleft()
+            if now - created_at <= self.max_idle:
+                self.hits += 1
+                self._schedule_refill()
+                return thread_id
+            self._discard(thread_id)
+
+        self.misses += 1
+        self._schedule_refill()
+        thread = await self._get_client().beta.threads.create()
+        return thread.id
+
+    def _schedule_refill(self) -> None:
+        if self.size <= 0:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.ensure_future(self._refill())
+
+    async def _refill(self) -> None:
+        # Only ever one refill task at a time (see _schedule_refill); loop in
+        # case threads were taken while the previous batch was being created.
+        while len(self._threads) < self.size:
+            client = self._get_client()
+            results = await asyncio.gather(
+                *[client.beta.threads.create() for _ in range(self.size - len(self._threads))],
+                return_exceptions=True
+            )
+            now = time.monotonic()
+            failed = False
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"⚠️ Thread pool refill failed: {result}")
+                    failed = True
+                    continue
+                self._threads.append((result.id, now))
+                self.created += 1
+            if failed:
+                # Retry on the next take or sweep rather than hammering the API
+                break
+
+    def _discard(self, thread_id: str) -> None:
+        """Delete an expired pooled thread in the background"""
+        self.evicted += 1
+
+        async def _delete():
+            try:
+                await self._get_client().beta.threads.delete(thread_id)
+            except Exception as e:
+                print(f"⚠️ Could not delete pooled thread {thread_id}: {e}")
+
+        asyncio.ensure_future(_delete())
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        keep = deque()
+        for thread_id, created_at in self._threads:
+            if now - created_at > self.max_idle:
+                self._discard(thread_id)
+            else:
+                keep.append((thread_id, created_at))
+        self._threads = keep
+
+    async def _sweep(self) -> None:
+        while True:
+            self._evict_expired()
+            self._schedule_refill()
+            if self._refill_task is not None:
+                await asyncio.shield(self._refill_task)
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self) -> None:
+        """Fill the pool and keep it fresh; call from the app's startup hook"""
+        if self.size > 0 and self._sweeper is None:
+            self._sweeper = asyncio.ensure_future(self._sweep())
+
+    async def stop(self) -> None:
+        """Stop background work and delete threads that were never used"""
+        for task in (self._sweeper, self._refill_task):
+            if task is not None:
+                task.cancel()
+        self._sweeper = None
+        if not self._threads:
+            return
+        client = self._get_client()
+        pending = [client.beta.threads.delete(thread_id) for thread_id, _ in self._threads]
+        self._threads.clear()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": len(self._threads),
+            "target_size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "evicted": self.evicted,
+        }
@@ -1,9 +1,35 @@
 import os
-from tavily import TavilyClient
+import json
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
-# Initialize Tavily client
+import http_clients
+from cache import SingleFlight, build_cache, make_cache_key
+from ingest import get_document_text
+from metrics import SEARCH_LATENCY, TOOL_LATENCY, RunTimings
+from regulation_index import REGULATION_INDEX_MIN_SCORE, open_index
+from risk_rules import classify_system
+
+# Tavily client on the shared pooled session (sized for the tool threads).
+# Built on the first search so cold starts skip importing the SDK.
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
-tavily_client = TavilyClient(api_key=TAVILY_API_KEY) if TAVILY_API_KEY else None
+tavily_client = None
+_tavily_lock = threading.Lock()
+
+def get_tavily_client():
+    global tavily_client
+    if tavily_client is None and TAVILY_API_KEY:
+        with _tavily_lock:
+            if tavily_client is None:
+                from tavily import TavilyClient
+                tavily_client = TavilyClient(api_key=TAVILY_API_KEY, session=http_clients.session("tavily"))
+    return tavily_client
+
+def tavily_configured() -> bool:
+    return tavily_client is not None or bool(TAVILY_API_KEY)
 
 # Allowed web search domains (ONLY these 3 official EU URLs)
 ALLOWED_SEARCH_DOMAINS = [
@@ -12,21 +38,49 @@ ALLOWED_SEARCH_DOMAINS = [
     "digital-strategy.ec.europa.eu"
 ]
 
-def search_web_restricted(query: str):
-    """Search web using Tavily, restricted to allowed domains only"""
-    if not tavily_client:
-        return {"error": "Tavily API key not configured"}
-        
+# Number of results requested from Tavily per search
+SEARCH_MAX_RESULTS = 5
+
+# Search result cache (in-memory by default, SQLite when SEARCH_CACHE_PATH is set)
+SEARCH_CACHE = build_cache(
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL", "21600")),
+    max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    path=os.getenv("SEARCH_CACHE_PATH")
+)
+
+# Identical searches in flight at the same time share one Tavily call
+SEARCH_FLIGHTS = SingleFlight()
+
+# Local full-text index of the allowed domains, searched before Tavily (None until built)
+REGULATION_INDEX = open_index()
+
+# Tool execution limits (per tool call, seconds)
+TOOL_TIMEOUTS = {
+    "search_web": float(os.getenv("SEARCH_WEB_TIMEOUT", "15")),
+    "classify_risk": float(os.getenv("CLASSIFY_RISK_TIMEOUT", "5")),
+}
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+# Max tool calls of one run step executing at the same time
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+
+# Tools are blocking (Tavily uses requests), so they run on a dedicated pool
+# that also caps tool threads across all concurrent runs in this worker.
+_tool_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TOOL_WORKER_THREADS", "16")),
+    thread_name_prefix="tool"
+)
+
+def _search_tavily(query: str, cache_key: str):
     try:
         print(f"🌐 Web search query: {query}")
         print(f"   Restricted to domains: {ALLOWED_SEARCH_DOMAINS}")
         
         # Search with domain restriction
-        response = tavily_client.search(
+        response = get_tavily_client().search(
             query=query,
             search_depth="advanced",
             include_domains=ALLOWED_SEARCH_DOMAINS,
-            max_results=5
+            max_results=SEARCH_MAX_RESULTS
         )
         
         results = []
@@ -39,6 +93,8 @@ def search_web_restricted(query: str):
             })
         
         print(f"   Found {len(results)} results from allowed domains")
+        # Only successful searches are cached, errors are retried next time
+        SEARCH_CACHE.set(cache_key, results)
         return {
             "results": results,
             "query": query
@@ -47,6 +103,74 @@ def search_web_restricted(query: str):
         print(f"Web search error: {str(e)}")
         return {"results": [], "query": query, "error": str(e)}
 
+def _local_search(query: str):
+    """Local index results if they are confident enough (any results when Tavily is unavailable)"""
+    if REGULATION_INDEX is None:
+        return None
+    try:
+        results, confidence = REGULATION_INDEX.search(query, SEARCH_MAX_RESULTS)
+    except Exception as e:
+        print(f"⚠️ Local regulation index search failed: {e}")
+        return None
+    if results and (confidence >= REGULATION_INDEX_MIN_SCORE or not tavily_configured()):
+        print(f"📚 Local index answered ({confidence:.2f}): {query}")
+        return {"results": results, "query": query, "source": "local_index"}
+    return None
+
+def _cached_search(query: str):
+    """Return (cache_key, cached response or None)"""
+    cache_key = make_cache_key(query, ALLOWED_SEARCH_DOMAINS, SEARCH_MAX_RESULTS)
+    cached = SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        print(f"⚡ Web search cache hit: {query}")
+        return cache_key, {"results": cached, "query": query}
+    return cache_key, None
+
+def search_web_restricted(query: str):
+    """Search the local regulation index, then Tavily restricted to allowed domains only"""
+    started = time.monotonic()
+    local = _local_search(query)
+    if local is not None:
+        SEARCH_LATENCY.observe(time.monotonic() - started, source="local")
+        return local
+    if not tavily_configured():
+        return {"error": "Tavily API key not configured"}
+
+    cache_key, cached = _cached_search(query)
+    if cached is not None:
+        SEARCH_LATENCY.observe(time.monotonic() - started, source="cache")
+        return cached
+    response = SEARCH_FLIGHTS.do(cache_key, lambda: _search_tavily(query, cache_key))
+    SEARCH_LATENCY.observe(time.monotonic() - started, source="error" if "error" in response else "tavily")
+    return {**response, "query": query}
+
+async def search_web_restricted_async(query: str):
+    """Async variant of search_web_restricted; coalesces with threaded callers"""
+    started = time.monotonic()
+    loop = asyncio.get_running_loop()
+    if REGULATION_INDEX is not None:
+        local = await loop.run_in_executor(_tool_executor, _local_search, query)
+        if local is not None:
+            SEARCH_LATENCY.observe(time.monotonic() - started, source="local")
+            return local
+    if not tavily_configured():
+        return {"error": "Tavily API key not configured"}
+
+    if SEARCH_CACHE.blocking:
+        # The SQLite cache reads and updates its file; keep that off the event loop
+        cache_key, cached = await loop.run_in_executor(_tool_executor, _cached_search, query)
+    else:
+        cache_key, cached = _cached_search(query)
+    if cached is not None:
+        SEARCH_LATENCY.observe(time.monotonic() - started, source="cache")
+        return cached
+    response = await SEARCH_FLIGHTS.do_async(
+        cache_key,
+        lambda: loop.run_in_executor(_tool_executor, _search_tavily, query, cache_key)
+    )
+    SEARCH_LATENCY.observe(time.monotonic() - started, source="error" if "error" in response else "tavily")
+    return {**response, "query": query}
+
 # Tool Definitions
 TOOLS = [
     {
@@ -88,6 +212,10 @@ TOOLS = [
                         "type": "array",
                         "items": {"type": "string"},
                         "description": "Key features of the AI system"
+                    },
+                    "file_id": {
+                        "type": "string",
+                        "description": "Optional ID of an uploaded document describing the system; its text is included in the classification"
                     }
                 },
                 "required": ["system_description"]
@@ -96,53 +224,97 @@ TOOLS = [
     }
 ]
 
-def classify_risk(system_description: str, features: list = None):
+def classify_risk(system_description: str, features: list = None, file_id: str = None):
     """
-    Mock risk classification logic.
-    In a real scenario, this would use a more complex logic or another LLM call 
-    specifically designed for classification with a deterministic prompt.
-    For now, we return a structured placeholder.
+    Rule-based risk classification.
+    Matches the description and features against the EU AI Act rule table
+    (risk_rules.json) in a single pass and returns the most severe tier,
+    together with every matched term and its tier.
+    If file_id refers to a locally ingested upload, its text is matched too.
     """
-    # Simple keyword-based heuristic for the mockup
-    description_lower = system_description.lower()
-    
-    if any(keyword in description_lower for keyword in ["biometric", "police", "surveillance", "safety component", "education", "employment"]):
-         return {
-            "risk_level": "High Risk",
-            "reasoning": "The system falls under high-risk categories (e.g., biometrics, critical infrastructure, education, employment) as defined in Annex III of the EU AI Act.",
-            "relevant_articles": ["Article 6", "Annex III"],
-            "obligations": [
-                "Risk management system (Art. 9)",
-                "Data governance (Art. 10)",
-                "Technical documentation (Art. 11)",
-                "Record keeping (Art. 12)",
-                "Transparency (Art. 13)",
-                "Human oversight (Art. 14)",
-                "Accuracy, robustness, cybersecurity (Art. 15)"
-            ]
-        }
-    elif any(keyword in description_lower for keyword in ["chatbot", "deepfake", "emotion recognition", "manipulation"]):
-        return {
-            "risk_level": "Limited Risk", 
-            "reasoning": "The system triggers transparency obligations (e.g., chatbots, emotion recognition, deep fakes) under Article 50.",
-            "relevant_articles": ["Article 50"],
-            "obligations": [
-                "Transparency obligations (Art. 50): Inform users they are interacting with an AI system."
-            ]
-        }
-    elif any(keyword in description_lower for keyword in ["spam", "game", "filter", "inventory"]):
-        return {
-            "risk_level": "Minimal Risk",
-            "reasoning": "The system does not fall into prohibited, high-risk, or limited risk categories. It is free to use.",
-            "relevant_articles": ["Article 69 (Voluntary Codes of Conduct)"],
-            "obligations": [
-                "No broad obligations, but voluntary codes of conduct are encouraged."
-            ]
-    }
+    if file_id:
+        document_text = get_document_text(file_id)
+        if document_text:
+            system_description = f"{system_description or ''}\n{document_text}"
+    return classify_system(system_description, features)
+
+def run_tool(function_name: str, args: dict) -> str:
+    """Execute one function tool synchronously and return its output string"""
+    if function_name == "search_web":
+        return str(search_web_restricted(args.get("query")))
+    elif function_name == "classify_risk":
+        return json.dumps(classify_risk(args.get("system_description"), args.get("features"), args.get("file_id")))
     else:
-         return {
-            "risk_level": "Unclassified / Minimal Risk",
-            "reasoning": "Based on the description properly provided, no specific high-risk or limited-risk criteria were matched.",
-            "relevant_articles": [],
-            "obligations": []
-        }
+        return "Unknown tool"
+
+async def run_tool_async(function_name: str, args: dict) -> str:
+    """Execute one function tool without blocking the event loop"""
+    if function_name == "search_web":
+        # Coalesced before taking a tool thread, so duplicate queries don't queue up
+        return str(await search_web_restricted_async(args.get("query")))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_tool_executor, run_tool, function_name, args)
+
+async def _execute_tool_call(tool_call, semaphore: asyncio.Semaphore,
+                             timings: Optional[RunTimings] = None) -> dict:
+    function_name = tool_call.function.name
+    timeout = TOOL_TIMEOUTS.get(function_name, DEFAULT_TOOL_TIMEOUT)
+
+    try:
+        args = json.loads(tool_call.function.arguments or "{}")
+    except json.JSONDecodeError as e:
+        TOOL_LATENCY.observe(0.0, tool=function_name, outcome="invalid_arguments")
+        output = json.dumps({"error": "invalid_arguments", "tool": function_name, "detail": str(e)})
+        return {"tool_call_id": tool_call.id, "output": output}
+
+    print(f"   Calling: {function_name} with {args}")
+
+    try:
+        await semaphore.acquire()
+    except asyncio.CancelledError:
+        # The run was abandoned before this call got a slot: it never runs
+        TOOL_LATENCY.observe(0.0, tool=function_name, outcome="cancelled")
+        raise
+    try:
+        started = time.monotonic()
+        outcome = "ok"
+        try:
+            # A timed-out call keeps its thread until Tavily returns,
+            # but the run no longer waits for it.
+            output = await asyncio.wait_for(run_tool_async(function_name, args), timeout=timeout)
+        except asyncio.CancelledError:
+            # Client went away: calls still queued on the tool executor are dropped,
+            # one already running finishes in its thread and its result is discarded
+            print(f"   🔌 {function_name} abandoned")
+            TOOL_LATENCY.observe(time.monotonic() - started, tool=function_name, outcome="cancelled")
+            raise
+        except asyncio.TimeoutError:
+            print(f"   ⏱️ {function_name} timed out after {timeout}s")
+            outcome = "timeout"
+            output = json.dumps({
+                "error": "timeout",
+                "tool": function_name,
+                "detail": f"Tool did not finish within {timeout} seconds"
+            })
+        except Exception as e:
+            print(f"   Tool error in {function_name}: {e}")
+            outcome = "error"
+            output = json.dumps({"error": "tool_failed", "tool": function_name, "detail": str(e)})
+        elapsed = time.monotonic() - started
+    finally:
+        semaphore.release()
+
+    TOOL_LATENCY.observe(elapsed, tool=function_name, outcome=outcome)
+    if timings is not None:
+        timings.tools.append({"tool": function_name, "outcome": outcome, "seconds": round(elapsed, 3)})
+    return {"tool_call_id": tool_call.id, "output": output}
+
+async def dispatch_tool_calls(tool_calls, timings: Optional[RunTimings] = None) -> List[dict]:
+    """
+    Run all tool calls of one run step concurrently.
+    Returns tool outputs in the original call order, ready for submit_tool_outputs.
+    Timeouts and failures become structured error outputs instead of failing the run.
+    Per-tool latencies are appended to `timings.tools` when given.
+    """
+    semaphore = asyncio.Semaphore(TOOL_MAX_CONCURRENCY)
+    return list(await asyncio.gather(*[_execute_tool_call(tc, semaphore, timings) for tc in tool_calls]))
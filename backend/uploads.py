@@ -0,0 +1,84 @@
+"""
+Upload helpers for /api/upload.
+
+Uploads are copied in fixed-size chunks into a spool that stays in memory
+for small files and moves to a temporary file on disk for large ones,
+hashing as it goes and stopping as soon as the size limit is crossed.
+The content hash feeds a dedup index so re-uploading the same document
+returns the existing OpenAI file_id.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from typing import BinaryIO, Tuple
+
+from fastapi import UploadFile
+
+from cache import SingleFlight, build_cache
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Uploads larger than this are spooled to disk instead of memory
+UPLOAD_SPOOL_MEMORY = int(os.getenv("UPLOAD_SPOOL_MEMORY", str(2 * 1024 * 1024)))
+
+# sha256 -> {"file_id", "filename", "bytes"}; SQLite-backed when UPLOAD_INDEX_PATH is set
+UPLOAD_INDEX = build_cache(
+    ttl_seconds=float(os.getenv("UPLOAD_INDEX_TTL", str(30 * 24 * 3600))),
+    max_bytes=int(os.getenv("UPLOAD_INDEX_MAX_BYTES", str(4 * 1024 * 1024))),
+    path=os.getenv("UPLOAD_INDEX_PATH")
+)
+
+# Concurrent uploads of the same document share one OpenAI upload
+UPLOAD_FLIGHTS = SingleFlight()
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def spool_upload(file: UploadFile) -> Tuple[BinaryIO, str, int]:
+    """
+    Copy an upload into a spool in chunks.
+    Returns (spool positioned at 0, sha256 hex digest, size in bytes).
+    Raises UploadTooLarge as soon as UPLOAD_MAX_BYTES is exceeded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    spool: BinaryIO = io.BytesIO()
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise UploadTooLarge(f"File exceeds the {UPLOAD_MAX_BYTES // (1024 * 1024)} MB upload limit")
+            digest.update(chunk)
+            if isinstance(spool, io.BytesIO) and size > UPLOAD_SPOOL_MEMORY:
+                # A plain file object (not SpooledTemporaryFile/NamedTemporaryFile
+                # wrappers) so the OpenAI client accepts and streams it on any
+                # Python version; it has a path so worker processes can open it.
+                fd, path = tempfile.mkstemp(prefix="upload-")
+                os.close(fd)
+                on_disk = open(path, "w+b")
+                on_disk.write(spool.getvalue())
+                spool = on_disk
+            spool.write(chunk)
+    except BaseException:
+        close_spool(spool)
+        raise
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
+
+
+def close_spool(spool: BinaryIO) -> None:
+    """Close a spool and remove its temporary file, if it has one"""
+    path = getattr(spool, "name", None)
+    spool.close()
+    if isinstance(path, str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
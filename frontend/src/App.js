@@ -24,6 +24,8 @@ function App() {
   const fileInputRef = useRef(null);
 
   const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8005';
+  // Reconnects to a chat stream whose connection dropped before giving up
+  const STREAM_RESUME_ATTEMPTS = 3;
 
   // Derived state
   const currentChat = chats[activeChat] || { messages: [], uploadedFiles: [], title: 'New conversation' };
@@ -147,8 +149,11 @@ function App() {
     setInput('');
     setLoading(true);
 
+    // Error reported by the server in the stream, shown instead of the generic connection message
+    let serverError = null;
+
     try {
-      const response = await fetch(`${API_URL}/api/chat/stream`, {
+      let response = await fetch(`${API_URL}/api/chat/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -161,45 +166,88 @@ function App() {
 
       if (!response.ok) throw new Error('Failed to send message');
 
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
       let assistantContent = '';
       let streamDone = false;
+      // ID of the last event handled ("<stream_id>:<seq>"), used to resume after a dropped connection
+      let lastEventId = null;
+      let resumeAttempts = 0;
 
       while (!streamDone) {
-        const { done, value } = await reader.read();
-        if (done) break;
-
-        const chunk = decoder.decode(value, { stream: true });
-        const lines = chunk.split('\n');
-
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
-            const dataStr = line.slice(6);
-            if (dataStr === '[DONE]') {
-              streamDone = true;
-              break;
-            }
-
-            try {
-              const data = JSON.parse(dataStr);
-              if (data.type === 'text') {
-                assistantContent += data.content;
-                const currentContent = assistantContent;
-                setMessages(prev => {
-                  const newMessages = [...prev];
-                  const lastMsg = { ...newMessages[newMessages.length - 1] };
-                  lastMsg.content = currentContent;
-                  lastMsg.loading = false;
-                  newMessages[newMessages.length - 1] = lastMsg;
-                  return newMessages;
-                });
+        try {
+          const reader = response.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = '';
+          let eventId = null;
+
+          while (!streamDone) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            // A frame can be split across reads; keep the unfinished last line for the next one
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+              if (line.startsWith('id: ')) {
+                eventId = line.slice(4);
+              } else if (line.startsWith('data: ')) {
+                const dataStr = line.slice(6);
+                if (dataStr === '[DONE]') {
+                  streamDone = true;
+                  break;
+                }
+
+                try {
+                  const data = JSON.parse(dataStr);
+                  if (data.type === 'text') {
+                    assistantContent += data.content;
+                    const currentContent = assistantContent;
+                    setMessages(prev => {
+                      const newMessages = [...prev];
+                      const lastMsg = { ...newMessages[newMessages.length - 1] };
+                      lastMsg.content = currentContent;
+                      lastMsg.loading = false;
+                      newMessages[newMessages.length - 1] = lastMsg;
+                      return newMessages;
+                    });
+                  } else if (data.type === 'error') {
+                    // The server ended the answer itself; there is nothing to resume
+                    serverError = data.content;
+                  }
+                } catch (e) {
+                  console.error('Error parsing stream', e);
+                }
+                // Only count the event as received once its data has been handled
+                if (eventId) lastEventId = eventId;
               }
-            } catch (e) {
-              console.error('Error parsing stream', e);
             }
           }
+        } catch (e) {
+          if (!lastEventId || serverError) throw e;
+          console.warn('Stream interrupted', e);
+        }
+        if (serverError) throw new Error(serverError);
+        if (streamDone) break;
+
+        // The connection dropped mid-answer: re-attach to the same run instead of asking again
+        response = null;
+        while (!response) {
+          if (!lastEventId || resumeAttempts >= STREAM_RESUME_ATTEMPTS) {
+            throw new Error('Stream interrupted');
+          }
+          resumeAttempts += 1;
+          await new Promise(resolve => setTimeout(resolve, 500 * resumeAttempts));
+          try {
+            const streamId = lastEventId.split(':')[0];
+            response = await fetch(`${API_URL}/api/chat/stream/${streamId}`, {
+              headers: { 'Last-Event-ID': lastEventId },
+            });
+          } catch (e) {
+            console.warn('Resume failed', e);
+          }
         }
+        if (!response.ok) throw new Error('Failed to resume stream');
       }
 
       if (uploadedFiles.length > 0) {
@@ -211,7 +259,7 @@ function App() {
         const newMessages = [...prev];
         newMessages[newMessages.length - 1] = {
           role: 'error',
-          content: 'Connection failed. Please try again.',
+          content: serverError || 'Connection failed. Please try again.',
           timestamp: new Date().toISOString()
         };
         return newMessages;